@@ -9,9 +9,15 @@ Linked lists are implemented by linking nodes.
 A list such as [5, 3, 8] will be stored as 3 separate objects in a linked structure. Each of these objects will store the 
 value plus references (links) to the neighboring elements. To build a linked structure, we use an auxiliary class that is 
 commonly called a node. The node keeps track of three things: The data, the previous node, and the next node
+
+By default every instance stores its attributes in its own __dict__, which costs far more memory than the three
+references a node actually holds. Declaring __slots__ stores the attributes in fixed positions inside the object
+instead, so no __dict__ is created for each node.
 '''
 
 class Node:
+    __slots__ = ("data", "prev", "next")
+
     def __init__(self, data):
         self.data = data
         self.prev = None
@@ -21,20 +27,47 @@ class Node:
 The linked list will be implemented in a class named LinkedList. This class will use the Node class to chain the data together into 
 a list-like structure. The first node of a linked list is commonly known as head while the last node of a list is called the tail.
 Linkedlist object will keep track of list length, head node, and tail node
+
+With pooled=True, nodes removed by dequeue/pop are kept in a free list (chained through their next attribute)
+and reused by the next append/prepend, so enqueue/dequeue churn does not allocate a new object every time.
 '''
     
-    class LinkedList:
+class LinkedList:
+    node_class = Node
     
-    def __init__(self):
+    def __init__(self, pooled=False):
         self.head = None
         self.tail = None
         self.length = 0
+        self.pooled = pooled
+        self._free = None
+    '''
+    Returns a node holding data, reusing a node from the free list when one is available.
+    '''
+    def _new_node(self, data):
+        node = self._free
+        if node is None:
+            return self.node_class(data)
+        self._free = node.next
+        node.data = data
+        node.next = None
+        return node
+    '''
+    Called with a node that has been unlinked from the list. In pooled mode the node is cleared,
+    so it does not keep its data alive, and pushed onto the free list.
+    '''
+    def _release(self, node):
+        if self.pooled:
+            node.data = None
+            node.prev = None
+            node.next = self._free
+            self._free = node
     '''
     Append method for the LinkedList class. If the list is empty, the head and tail are equal to the new node
     if not empty, then the next tail is equal to new data point and the previous tail is documented. 
     '''   
     def append(self, data):
-        new_node = Node(data)
+        new_node = self._new_node(data)
         if self.length == 0:
             self.head = self.tail = new_node
         else:
@@ -43,24 +76,103 @@ Linkedlist object will keep track of list length, head node, and tail node
             self.tail = new_node
         self.length += 1
     '''
-    Iter method allows for the class object to be iterable. The __iter__ method should always return self for a reference to the object
-    that is being iterated over. _iter_node is an attribute that keeps track of the current node. The "_" notation in front of the attribute
-    denotes that the attribute is internal and not accessible to the end user. 
+    Iter method allows for the class object to be iterable. Writing __iter__ as a generator means every call
+    returns a new iterator with its own current node, kept as a local variable of the generator. Two loops over
+    the same list therefore do not interfere with each other, as they would if the current node were stored
+    on the list itself.
     '''    
     def __iter__(self):
-        self._iter_node = self.head
-        return self 
-    '''
-    Returns the current iteration value stored at _iter_node. 
-    Moves _iter_node to the next value.
-    Stops when the iteration is over (When _iter_node is equal to None)
-    '''
-    def __next__(self):
-        if self._iter_node is None:
-            raise StopIteration
-        ret = self._iter_node.data
-        self._iter_node = self._iter_node.next
-        return ret
+        node = self.head
+        while node is not None:
+            yield node.data
+            node = node.next
+    '''
+    Allows for the use of the built-in reversed function. Walks from the tail to the head using prev.
+    '''
+    def __reversed__(self):
+        node = self.tail
+        while node is not None:
+            yield node.data
+            node = node.prev
+    '''
+    Appends every value of iterable in one pass. The new nodes are linked to each other first and the
+    finished chain is attached to the tail at the end, so the list is only updated once.
+    '''
+    def extend(self, iterable):
+        first = last = None
+        count = 0
+        for data in iterable:
+            node = self._new_node(data)
+            if first is None:
+                first = node
+            else:
+                last.next = node
+                node.prev = last
+            last = node
+            count += 1
+        if first is None:
+            return
+        if self.length == 0:
+            self.head = first
+        else:
+            self.tail.next = first
+            first.prev = self.tail
+        self.tail = last
+        self.length += count
+    '''
+    Builds a list (or Queue/Stack) from the values of iterable, added with extend(): in head to tail order,
+    or in enqueue order for a Queue.
+    '''
+    @classmethod
+    def from_iterable(cls, iterable, **kwargs):
+        linked_list = cls(**kwargs)
+        linked_list.extend(iterable)
+        return linked_list
+    '''
+    Moves all nodes of other into this list right after the node after, or at the front if after is None.
+    No nodes are copied: only the pointers at the two ends of other are relinked, so splicing is O(1).
+    other is left empty.
+    '''
+    def splice(self, other, after=None):
+        if other is self:
+            raise ValueError("cannot splice a list into itself")
+        if other.length == 0:
+            return
+        first, last = other.head, other.tail
+        if after is None:
+            following = self.head
+            self.head = first
+        else:
+            following = after.next
+            after.next = first
+        first.prev = after
+        last.next = following
+        if following is None:
+            self.tail = last
+        else:
+            following.prev = last
+        self.length += other.length
+        other.head = other.tail = None
+        other.length = 0
+    '''
+    Unlinks node from the list in O(1) by connecting its prev and next nodes to each other.
+    '''
+    def remove_node(self, node):
+        if node.prev is None:
+            self.head = node.next
+        else:
+            node.prev.next = node.next
+        if node.next is None:
+            self.tail = node.prev
+        else:
+            node.next.prev = node.prev
+        self.length -= 1
+        self._release(node)
+    '''
+    Moves all nodes of other to the end of this list in O(1). other is left empty.
+    '''
+    def concat(self, other):
+        self.splice(other, self.tail)
     '''
     Prepending data involves adding data to the head of the list
     Set the previous node of the current head to the newly created node.
@@ -68,7 +180,7 @@ Linkedlist object will keep track of list length, head node, and tail node
     Making the newly created node become the new head.
     '''
     def prepend(self, data):
-        new_node = Node(data)
+        new_node = self._new_node(data)
         if self.length == 0:
             self.head = self.tail = new_node
         else:
@@ -82,11 +194,11 @@ Linkedlist object will keep track of list length, head node, and tail node
     def __len__(self):
         return self.length
     '''
-    Uses list comprehension to convert the values in the LinkedList class into a standard
-    Python list and surround the list on quotes
+    Formats the values like a standard Python list, joining their representations directly
+    instead of building an intermediate list first
     '''
     def __str__(self):
-        return str([value for value in self])
+        return "[" + ", ".join(map(repr, self)) + "]"
 
 
 '''
@@ -109,9 +221,39 @@ class Queue(LinkedList):
     def enqueue(self, data):
         self.prepend(data)
     '''
+    Enqueues every value of iterable in order, so the first value is dequeued first, as with repeated enqueue()
+    calls. LinkedList.extend would attach them at the tail, which is the front of the queue.
+    The new nodes are linked to each other first, each in front of the previous one, and the finished chain
+    is attached at the head at the end.
+    '''
+    def extend(self, iterable):
+        first = last = None
+        count = 0
+        for data in iterable:
+            node = self._new_node(data)
+            if first is None:
+                first = node
+            else:
+                node.next = last
+                last.prev = node
+            last = node
+            count += 1
+        if first is None:
+            return
+        if self.length == 0:
+            self.tail = first
+        else:
+            first.next = self.head
+            self.head.prev = first
+        self.head = last
+        self.length += count
+    '''
     Acquires the data attribute of the tail node, the front of the queue
+    An empty queue has no tail node, so raise IndexError instead of failing on None.data
     '''    
     def get_front(self):
+        if self.length == 0:
+            raise IndexError("get_front from an empty queue")
         return self.tail.data
     
     '''
@@ -120,67 +262,65 @@ class Queue(LinkedList):
     Update the tail to become the previous node of the current tail (move the tail back one position).
     Set the next element of the new tail to be None
     Subtract 1 from the list length
+    Hand the removed node back to the list so it can be reused in pooled mode
     '''
     def dequeue(self):
-        ret = self.tail.data
+        if self.length == 0:
+            raise IndexError("dequeue from an empty queue")
+        node = self.tail
+        ret = node.data
         if self.length == 1:
             self.tail = self.head = None
         else:
             self.tail = self.tail.prev
             self.tail.next = None
         self.length -= 1
+        self._release(node)
         return ret
 
-cur_time = 0
-num_processes_done = 0
-wait_queue = Queue()
-cur_pid = None
-
-# Process dataframe columns are ['Pid', 'Arrival', 'Duration', 'Start', 'End']
-# The Pid column represents the process identifiers. The Arrival column represents the time 
-# at which the processor received the task. Finally, the Duration column gives the time the task required to run.
-'''
-While loop condition is terminated once the number of completed processes is equal to 
-the number of rows in the process dataframe
-'''
-while num_processes_done < processes.shape[0]:
-    # Check if current process finished
-    if cur_pid is not None:
-        if processes.loc[cur_pid, "Start"] + processes.loc[cur_pid, "Duration"] == cur_time:
-            '''
-            Handle end of the process: If cur_pid is not None, then we check whether its starting time 
-            plus its duration are equal to cur_time. If they are, it means the process is done executing. 
-            We can then set the end time of this process to cur_time and set cur_pid to None to free the processor.
-            '''
-            processes.loc[cur_pid, "End"] = cur_time
-            cur_pid = None
-            num_processes_done += 1
-    # Handle arriving processes
-    '''
-    Find all processes with arrival time equal to cur_time and add them to the wait_queue.
-    '''
-    ready_processes = processes[processes["Arrival"] == cur_time]
-    for pid, _ in ready_processes.iterrows():
-        wait_queue.enqueue(pid)
-    # Assign a process to the processor
-    if cur_pid is None and len(wait_queue) > 0:
-        '''
-        If the processor is free, that is, cur_pid is None, and there are processes waiting in the queue then 
-        remove the process at the front of the queue and assign it to cur_pid. 
-        We also need to set its start time to cur_time
-        '''
-        cur_pid = wait_queue.dequeue()
-        processes.loc[cur_pid, "Start"] = cur_time 
-    cur_time += 1
-    
-print(processes.head())
+'''
+Memory benchmark: bytes per element of a Queue built from nodes with a __dict__ (the original Node)
+compared with the __slots__ Node. tracemalloc counts every allocation made while the queue is filled.
+The values are created before tracing starts so only the queue's own memory is measured.
+'''
+import tracemalloc
+import time
 
-processes["Wait"] = processes["Start"] - processes["Arrival"]
-average_wait_time = processes["Wait"].mean()
+class DictNode:
+    def __init__(self, data):
+        self.data = data
+        self.prev = None
+        self.next = None
+
+class DictQueue(Queue):
+    node_class = DictNode
+
+def bytes_per_element(queue_class, values):
+    tracemalloc.start()
+    queue = queue_class()
+    for value in values:
+        queue.enqueue(value)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / len(values)
 
-processes["Turnaround"] = processes["End"] - processes["Arrival"]
-average_turnaround_time = processes["Turnaround"].mean()
+NUM_VALUES = 100000
 
+# The benchmarks only run when the script is executed directly, not when a worker process imports it
+if __name__ == "__main__":
+    values = list(range(NUM_VALUES))
+    print("__dict__ nodes: {:.1f} bytes per element".format(bytes_per_element(DictQueue, values)))
+    print("__slots__ nodes: {:.1f} bytes per element".format(bytes_per_element(Queue, values)))
+
+    # Enqueue/dequeue churn with and without the free list
+    for pooled in [False, True]:
+        queue = Queue(pooled=pooled)
+        start = time.time()
+        for value in values:
+            queue.enqueue(value)
+            queue.dequeue()
+        end = time.time()
+        print("pooled={}: {:.3f}s".format(pooled, end - start))
 
 
 # Stacks are a last-in, first-out (LIFO) data structure. 
@@ -196,6 +336,8 @@ class Stack(LinkedList):
         self.append(data)
     # peek method returns the top element without deleting it
     def peek(self):
+        if self.length == 0:
+            raise IndexError("peek from an empty stack")
         return self.tail.data
     # pop method removes and retrieves the top part of the stack.
     '''
@@ -204,54 +346,724 @@ class Stack(LinkedList):
     Set the next element of the new tail to be None.
     '''
     def pop(self):
-        ret = self.tail.data
+        if self.length == 0:
+            raise IndexError("pop from an empty stack")
+        node = self.tail
+        ret = node.data
         if self.length == 1:
             self.tail = self.head = None
         else:
             self.tail = self.tail.prev
             self.tail.next = None
         self.length -= 1
+        self._release(node)
         return ret
+
+'''
+The processes dataframe has one row per process id, with the time it arrived (Arrival) and the time it
+needs to run (Duration). A tick-by-tick FCFS or LCFS loop advances cur_time one unit at a time and filters
+the whole dataframe on every tick, so a trace costs O(total_time * N) even when nothing happens for long stretches.
+•An event-driven simulation only visits the times at which something changes: the next arrival
+or the next completion. Everything in between is skipped.
+•Arrivals are sorted once by arrival time. Running processes are kept in a min-heap keyed by
+their end time, so the next completion is always at the top of the heap.
+•The wait list is pluggable: a Queue gives FCFS and a Stack gives LCFS.
 '''
-The Pid column represents the process identifiers. 
-The Arrival column represents the time at which the processor received the task. 
-Finally, the Duration column gives the time the task required to run.
+import heapq
+import numpy as np
+
+'''
+Policies that order the wait list by a key (shortest job, shortest remaining time, priority) need a min-heap,
+so that every push and pop is O(log n) even with millions of waiting processes.
+•HeapWaitList is the same list-backed binary heap as the MinHeap class in Tree Structures.py, but uses the
+heapq module, which implements _heapify_up/_heapify_down in C.
+•Entries are (key, sequence, pid) tuples. The sequence number breaks ties in arrival order and means that
+pids never have to be compared.
+•key_name selects which per-process value the heap is ordered by. The scheduler passes in the matching
+mapping of pid to value.
 '''
+class HeapWaitList:
+    key_name = "duration"
+    preemptive = False
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.values = []
+        self.seq = 0
+
+    def push(self, pid):
+        heapq.heappush(self.values, (self.keys[pid], self.seq, pid))
+        self.seq += 1
+    # Returns the pid with the smallest key without removing it
+    def peek(self):
+        return self.values[0][2]
+    # Returns the smallest key in the heap
+    def min_key(self):
+        return self.values[0][0]
+
+    def pop(self):
+        return heapq.heappop(self.values)[2]
+
+    def __len__(self):
+        return len(self.values)
+
+# Shortest-job-first: non-preemptive, the waiting process with the smallest duration runs next
+class ShortestJobFirst(HeapWaitList):
+    key_name = "duration"
+
+# Shortest-remaining-time-first: a new arrival preempts a running process that has more time left
+class ShortestRemainingTime(HeapWaitList):
+    key_name = "remaining"
+    preemptive = True
+
+# Priority scheduling: the waiting process with the smallest priority value runs next
+class PriorityWaitList(HeapWaitList):
+    key_name = "priority"
+
+class Scheduler:
+    '''
+    policy is the wait list class. Any class with enqueue/dequeue (like Queue) or
+    push/pop (like Stack) methods and a length can be used, as well as the HeapWaitList policies.
+    num_processors is the number of identical processors that run processes in parallel.
+    quantum enables time slicing: a process runs for at most quantum time units before it goes back to
+    the wait list. Scheduler(Queue, quantum=q) is round robin.
+    preemptive makes a waiting process with a smaller key replace the running process with the largest key.
+    It defaults to the policy's own setting (True for ShortestRemainingTime) and only applies to heap policies.
+    '''
+    def __init__(self, policy=Queue, num_processors=1, quantum=None, preemptive=None):
+        self.policy = policy
+        self.num_processors = num_processors
+        self.quantum = quantum
+        if preemptive is None:
+            preemptive = getattr(policy, "preemptive", False)
+        self.preemptive = preemptive
+
+    def __repr__(self):
+        options = ""
+        if self.num_processors != 1:
+            options += ", num_processors={}".format(self.num_processors)
+        if self.quantum is not None:
+            options += ", quantum={}".format(self.quantum)
+        if self.preemptive != getattr(self.policy, "preemptive", False):
+            options += ", preemptive={}".format(self.preemptive)
+        return "Scheduler({}{})".format(self.policy.__name__, options)
+    '''
+    Creates an empty wait list and returns its insertion and removal methods.
+    keys maps each key_name to a mapping of pid to value, for the heap policies.
+    Raises ValueError if the policy needs a key that was not given, such as PriorityWaitList without priorities.
+    '''
+    def _wait_list(self, keys):
+        if issubclass(self.policy, HeapWaitList):
+            if keys.get(self.policy.key_name) is None:
+                raise ValueError("{} needs a {} for every process".format(self.policy.__name__, self.policy.key_name))
+            wait_list = self.policy(keys[self.policy.key_name])
+        else:
+            wait_list = self.policy()
+        if hasattr(wait_list, "enqueue"):
+            return wait_list, wait_list.enqueue, wait_list.dequeue
+        return wait_list, wait_list.push, wait_list.pop
+    '''
+    Runs the event loop over the process ids in order (sorted by arrival time).
+    arrival, duration and priority map a process id to its arrival time, duration and priority; start and end
+    are filled in with the same keys. Start is the first time a process gets a processor.
+    Running entries are (event_time, sequence, pid, dispatch_time, finishes) where event_time is the end of the
+    process, or the end of its time slice when a quantum is set. finishes is decided at dispatch (the process
+    runs for all of its remaining time), because with float times subtracting the elapsed time from the
+    remaining time does not always give exactly 0.
+    At each event time:
+        Handle every running process whose event time is cur_time. It either finishes or, if it still
+        has time remaining, is put back on the wait list after the new arrivals.
+        Add every process arriving at cur_time to the wait list.
+        While a processor is free, take the next process from the wait list and start it.
+        For preemptive policies, while the best waiting process has a smaller key than the worst running one,
+        swap them.
+    With one processor, no quantum and no preemption this is the same order of operations as a
+    tick-by-tick loop, so the results are identical.
+    '''
+    def _simulate(self, order, arrival, duration, start, end, priority=None):
+        remaining = duration.copy()
+        wait_list, put, get = self._wait_list(
+            {"duration": duration, "remaining": remaining, "priority": priority}
+        )
+        running = []
+        seq = 0
+        i = 0
+        n = len(order)
+
+        def dispatch(pid, cur_time):
+            nonlocal seq
+            if remaining[pid] == duration[pid]:
+                start[pid] = cur_time
+            run_time = remaining[pid]
+            finishes = self.quantum is None or run_time <= self.quantum
+            if not finishes:
+                run_time = self.quantum
+            heapq.heappush(running, (cur_time + run_time, seq, pid, cur_time, finishes))
+            seq += 1
+
+        while i < n or running:
+            if running and (i == n or running[0][0] <= arrival[order[i]]):
+                cur_time = running[0][0]
+            else:
+                cur_time = arrival[order[i]]
+            requeued = []
+            while running and running[0][0] == cur_time:
+                event_time, _, pid, dispatch_time, finishes = heapq.heappop(running)
+                if finishes:
+                    remaining[pid] = 0
+                    end[pid] = event_time
+                else:
+                    # A full time slice; remaining was larger than quantum, so it stays positive
+                    remaining[pid] -= self.quantum
+                    requeued.append(pid)
+            while i < n and arrival[order[i]] == cur_time:
+                put(order[i])
+                i += 1
+            for pid in requeued:
+                put(pid)
+            while len(running) < self.num_processors and len(wait_list) > 0:
+                dispatch(get(), cur_time)
+            if self.preemptive:
+                self._preempt(wait_list, running, remaining, dispatch, cur_time)
+        return start, end
+    '''
+    Preemption for heap policies. The key of a running process is its remaining time at cur_time for
+    ShortestRemainingTime, and its fixed duration or priority otherwise. Processes dispatched at cur_time are
+    never preempted at the same instant, so Start always records real progress, and neither are processes
+    with no time left to run, which only have their completion event pending.
+    '''
+    def _preempt(self, wait_list, running, remaining, dispatch, cur_time):
+        remaining_keys = wait_list.keys is remaining
+        while len(wait_list) > 0 and running:
+            worst = None
+            worst_key = None
+            for entry in running:
+                event_time, _, pid, dispatch_time, _ = entry
+                if dispatch_time == cur_time:
+                    continue
+                # remaining[pid] is only updated when the process stops, so subtract the time it has run since
+                # dispatch; with a quantum, event_time is the end of the time slice rather than of the process
+                left = remaining[pid] - (cur_time - dispatch_time)
+                if left <= 0:
+                    continue
+                key = left if remaining_keys else wait_list.keys[pid]
+                if worst is None or key > worst_key:
+                    worst, worst_key = entry, key
+            if worst is None or wait_list.min_key() >= worst_key:
+                return
+            running.remove(worst)
+            heapq.heapify(running)
+            event_time, _, pid, dispatch_time, _ = worst
+            remaining[pid] -= cur_time - dispatch_time
+            wait_list.push(pid)
+            dispatch(wait_list.pop(), cur_time)
+    '''
+    Simulates the processes dataframe (columns 'Arrival' and 'Duration', plus 'Priority' for PriorityWaitList,
+    indexed by pid) and returns a copy with the Start, End, Wait and Turnaround columns filled in.
+    '''
+    def run(self, processes, vectorized=False):
+        result = processes.copy()
+        has_priority = "Priority" in result.columns
+        if vectorized:
+            start, end = self.run_arrays(
+                result["Arrival"].to_numpy(), result["Duration"].to_numpy(),
+                result["Priority"].to_numpy() if has_priority else None
+            )
+            result["Start"] = start
+            result["End"] = end
+        else:
+            order = list(result.sort_values("Arrival", kind="stable").index)
+            start, end = self._simulate(
+                order, result["Arrival"].to_dict(), result["Duration"].to_dict(), {}, {},
+                result["Priority"].to_dict() if has_priority else None
+            )
+            result["Start"] = result.index.map(start)
+            result["End"] = result.index.map(end)
+        result["Wait"] = result["Start"] - result["Arrival"]
+        result["Turnaround"] = result["End"] - result["Arrival"]
+        return result
+    '''
+    Vectorized path for large traces. Reading and writing the dataframe one cell at a time costs far more
+    than the simulation itself, so instead:
+        Sort Arrival and Duration once into contiguous NumPy arrays (stable, so ties keep their row order).
+        Run the simulation on the integer positions 0 to N - 1 of the sorted arrays.
+        Scatter the start and end times back to the original row order in one assignment.
+    Returns the start and end times as NumPy arrays aligned with the input arrays.
+    '''
+    def run_arrays(self, arrival, duration, priority=None):
+        arrival = np.asarray(arrival)
+        order = np.argsort(arrival, kind="stable")
+        sorted_arrival = arrival[order]
+        sorted_duration = np.asarray(duration)[order]
+        sorted_priority = None if priority is None else np.asarray(priority)[order].tolist()
+        n = len(order)
+        start = [0] * n
+        end = [0] * n
+        # Python lists make the scalar reads and writes inside the event loop much cheaper than NumPy indexing
+        self._simulate(
+            range(n), sorted_arrival.tolist(), sorted_duration.tolist(), start, end, sorted_priority
+        )
+        # Start and End are sums of arrivals and durations, so float durations must not be truncated to int
+        dtype = np.result_type(sorted_arrival, sorted_duration)
+        start_times = np.empty(n, dtype=dtype)
+        end_times = np.empty(n, dtype=dtype)
+        start_times[order] = start
+        end_times[order] = end
+        return start_times, end_times
+
+'''
+Wait and turnaround statistics computed with vectorized array operations instead of dataframe columns.
+'''
+def scheduler_metrics(arrival, start, end):
+    arrival = np.asarray(arrival)
+    wait = np.asarray(start) - arrival
+    turnaround = np.asarray(end) - arrival
+    return {
+        "average_wait": wait.mean(),
+        "max_wait": wait.max(),
+        "average_turnaround": turnaround.mean(),
+        "max_turnaround": turnaround.max(),
+    }
+
+# Scheduler.run returns a copy of processes with the Start, End, Wait and Turnaround columns filled in
+fcfs_processes = Scheduler(Queue).run(processes)
+lcfs_processes = Scheduler(Stack).run(processes)
+print(fcfs_processes.head())
+
+fcfs_average_wait = fcfs_processes["Wait"].mean()
+fcfs_average_turnaround = fcfs_processes["Turnaround"].mean()
+lcfs_average_wait = lcfs_processes["Wait"].mean()
+lcfs_average_turnaround = lcfs_processes["Turnaround"].mean()
+
+fcfs_max_wait = fcfs_processes["Wait"].max()
+lcfs_max_wait = lcfs_processes["Wait"].max()
+
+start, end = Scheduler(Queue).run_arrays(processes["Arrival"].to_numpy(), processes["Duration"].to_numpy())
+fcfs_metrics = scheduler_metrics(processes["Arrival"].to_numpy(), start, end)
+
+'''
+Comparing FCFS and LCFS over many synthetic workloads and seeds means running thousands of independent,
+single-threaded simulations, which can be spread over a process pool.
+•The workload arrays are generated in the main process and sent to the workers as compact int64 NumPy arrays,
+which pickle as a single buffer. Dataframes are never sent.
+•Each worker returns one row of metrics, and the rows are collected into a single results table.
+'''
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+'''
+Example workload generator: exponential inter-arrival times and durations, rounded to whole time units.
+Any function taking a seed and returning (arrival, duration) arrays can be used in a sweep.
+'''
+def random_workload(seed, num_processes=1000, mean_interarrival=5, mean_duration=4):
+    rng = np.random.default_rng(seed)
+    arrival = np.cumsum(np.rint(rng.exponential(mean_interarrival, num_processes)))
+    duration = np.maximum(1, np.rint(rng.exponential(mean_duration, num_processes)))
+    return arrival.astype(np.int64), duration.astype(np.int64)
+
+'''
+Runs in a worker process: simulates one workload with one policy and returns its metrics row.
+'''
+def _sweep_worker(task):
+    workload_name, seed, policy, arrival, duration = task
+    scheduler = policy if isinstance(policy, Scheduler) else Scheduler(policy)
+    start, end = scheduler.run_arrays(arrival, duration)
+    row = {"workload": workload_name, "seed": seed, "policy": repr(scheduler)}
+    row.update(scheduler_metrics(arrival, start, end))
+    return row
+
+'''
+workloads maps a workload name to a generator function workload(seed) -> (arrival, duration).
+policies is a list of wait list classes, for example [Queue, Stack], or configured Scheduler objects
+such as Scheduler(Queue, num_processors=4, quantum=10).
+Every workload x seed x policy combination is simulated on the process pool and the results
+are returned as a dataframe with one row per simulation.
+'''
+def run_sweep(workloads, policies, seeds, max_workers=None, chunksize=16):
+    def tasks():
+        for workload_name, workload in workloads.items():
+            for seed in seeds:
+                arrival, duration = workload(seed)
+                arrival = np.ascontiguousarray(arrival, dtype=np.int64)
+                duration = np.ascontiguousarray(duration, dtype=np.int64)
+                for policy in policies:
+                    yield workload_name, seed, policy, arrival, duration
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        rows = list(executor.map(_sweep_worker, tasks(), chunksize=chunksize))
+    return pd.DataFrame(rows)
+
+# Under the spawn start method (macOS, Windows) every worker imports this script again, so the sweep
+# must only start in the main process
+if __name__ == "__main__":
+    sweep_results = run_sweep(
+        {"light": random_workload, "heavy": lambda seed: random_workload(seed, mean_interarrival=3)},
+        [Queue, Stack, ShortestJobFirst, ShortestRemainingTime, Scheduler(Queue, quantum=4)],
+        seeds=range(100),
+    )
+    print(sweep_results.drop(columns="seed").groupby(["workload", "policy"]).mean())
+
+'''
+Queue and Stack allocate a Node for every element and follow prev pointers on every dequeue/pop.
+An array-backed ring buffer keeps the elements next to each other in one block of memory instead.
+•The buffer has a fixed capacity and a head index. Element i of the queue is stored at (head + i) % capacity,
+so removing from the front only moves the head index forward and nothing is shifted.
+•When the buffer is full, a new buffer with twice the capacity is allocated and the elements are copied over
+in order. Doubling means each element is copied O(1) times on average, so operations are amortized O(1).
+•With a typecode (for example "q" for 64-bit ints) the elements are stored in an array.array, which holds
+raw machine values instead of references to Python objects. This suits integer pids.
+RingQueue and RingStack keep the enqueue/dequeue/get_front and push/pop/peek methods of Queue and Stack,
+so they can be passed to Scheduler in place of them.
+'''
+import array
+
+class RingBuffer:
+    typecode = None
+
+    def __init__(self, capacity=16, typecode=None):
+        if typecode is not None:
+            self.typecode = typecode
+        self.capacity = max(1, capacity)
+        self.values = self._allocate(self.capacity)
+        self.head = 0
+        self.length = 0
+    '''
+    Returns storage for capacity elements: an array.array when a typecode is set, a list otherwise.
+    '''
+    def _allocate(self, capacity):
+        if self.typecode is None:
+            return [None] * capacity
+        return array.array(self.typecode, [0]) * capacity
+    '''
+    Copies the elements in order to a buffer twice as large and resets head to 0.
+    '''
+    def _grow(self):
+        values = self._allocate(self.capacity * 2)
+        for i in range(self.length):
+            values[i] = self.values[(self.head + i) % self.capacity]
+        self.values = values
+        self.capacity *= 2
+        self.head = 0
+    # Adds data after the last element
+    def _append(self, data):
+        if self.length == self.capacity:
+            self._grow()
+        self.values[(self.head + self.length) % self.capacity] = data
+        self.length += 1
+    # Removes and returns the first element
+    def _pop_first(self):
+        ret = self.values[self.head]
+        if self.typecode is None:
+            self.values[self.head] = None
+        self.head = (self.head + 1) % self.capacity
+        self.length -= 1
+        return ret
+    # Removes and returns the last element
+    def _pop_last(self):
+        index = (self.head + self.length - 1) % self.capacity
+        ret = self.values[index]
+        if self.typecode is None:
+            self.values[index] = None
+        self.length -= 1
+        return ret
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return str(list(self))
+
+class RingQueue(RingBuffer):
+
+    def enqueue(self, data):
+        self._append(data)
+
+    def get_front(self):
+        if self.length == 0:
+            raise IndexError("get_front from an empty queue")
+        return self.values[self.head]
+
+    def dequeue(self):
+        if self.length == 0:
+            raise IndexError("dequeue from an empty queue")
+        return self._pop_first()
+    '''
+    Iterates from the most recently enqueued element to the front, the same order as iterating over Queue.
+    '''
+    def __iter__(self):
+        for i in range(self.length - 1, -1, -1):
+            yield self.values[(self.head + i) % self.capacity]
+
+class RingStack(RingBuffer):
+
+    def push(self, data):
+        self._append(data)
+
+    def peek(self):
+        if self.length == 0:
+            raise IndexError("peek from an empty stack")
+        return self.values[(self.head + self.length - 1) % self.capacity]
+
+    def pop(self):
+        if self.length == 0:
+            raise IndexError("pop from an empty stack")
+        return self._pop_last()
+    '''
+    Iterates from the bottom to the top of the stack, the same order as iterating over Stack.
+    '''
+    def __iter__(self):
+        for i in range(self.length):
+            yield self.values[(self.head + i) % self.capacity]
+
+# Typed variants for integer pids, usable directly as Scheduler policies
+class IntRingQueue(RingQueue):
+    typecode = "q"
+
+class IntRingStack(RingStack):
+    typecode = "q"
+
+start, end = Scheduler(IntRingQueue).run_arrays(processes["Arrival"].to_numpy(), processes["Duration"].to_numpy())
+
+'''
+Queue and Stack are not safe to share between threads: two producers can both read the same head node
+in prepend and one of the elements is lost. The blocking variants below wrap a container in a
+threading.Condition, following the design of the standard library queue.Queue.
+•Every operation holds the condition's lock, so the wrapped container is only touched by one thread at a time.
+•maxsize bounds the container (0 means unbounded). Adding to a full container and removing from an
+empty one wait on the condition until another thread makes room or adds an element.
+•block=False fails immediately and timeout waits at most that many seconds. Both raise queue.Full or
+queue.Empty, like the standard library.
+•The *_many methods acquire the lock once for the whole batch, so a producer adding a thousand pids
+competes for the lock once instead of a thousand times.
+The container can be any class with the Queue or Stack methods, for example RingQueue.
+'''
+import threading
+import queue as std_queue
+
+class BlockingContainer:
+    container_class = None
+
+    def __init__(self, maxsize=0, container_class=None):
+        if container_class is not None:
+            self.container_class = container_class
+        self.container = self.container_class()
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+    # Subclasses return the container's insertion, removal and peek methods
+    def _methods(self):
+        raise NotImplementedError
+    '''
+    Waits on condition until ready() is true. Must be called with the lock held.
+    Raises error immediately if block is False, or once timeout seconds have passed.
+    '''
+    def _wait(self, condition, ready, block, timeout, error):
+        if ready():
+            return
+        if not block:
+            raise error
+        if timeout is None:
+            condition.wait_for(ready)
+        elif not condition.wait_for(ready, timeout):
+            raise error
+
+    def _is_full(self):
+        return self.maxsize > 0 and len(self.container) >= self.maxsize
+
+    def _put(self, data, block, timeout):
+        put = self._methods()[0]
+        with self.not_full:
+            self._wait(self.not_full, lambda: not self._is_full(), block, timeout, std_queue.Full)
+            put(data)
+            self.not_empty.notify()
+
+    def _get(self, block, timeout):
+        get = self._methods()[1]
+        with self.not_empty:
+            self._wait(self.not_empty, lambda: len(self.container) > 0, block, timeout, std_queue.Empty)
+            ret = get()
+            self.not_full.notify()
+            return ret
+    '''
+    Adds every item, waiting for room whenever the container is full. The lock is taken once; it is
+    only released while waiting. Returns the number of items added before a timeout, if any.
+    '''
+    def _put_many(self, items, block, timeout):
+        put = self._methods()[0]
+        count = 0
+        with self.not_full:
+            for data in items:
+                try:
+                    self._wait(self.not_full, lambda: not self._is_full(), block, timeout, std_queue.Full)
+                except std_queue.Full:
+                    if count == 0:
+                        raise
+                    break
+                put(data)
+                count += 1
+                self.not_empty.notify()
+        return count
+    '''
+    Waits until at least one item is available, then removes up to max_items items in one go.
+    '''
+    def _get_many(self, max_items, block, timeout):
+        get = self._methods()[1]
+        with self.not_empty:
+            self._wait(self.not_empty, lambda: len(self.container) > 0, block, timeout, std_queue.Empty)
+            ret = []
+            while len(self.container) > 0 and len(ret) < max_items:
+                ret.append(get())
+            self.not_full.notify(len(ret))
+            return ret
+
+    def _peek(self):
+        with self.lock:
+            return self._methods()[2]()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.container)
+
+class BlockingQueue(BlockingContainer):
+    container_class = Queue
+
+    def _methods(self):
+        return self.container.enqueue, self.container.dequeue, self.container.get_front
+
+    def enqueue(self, data, block=True, timeout=None):
+        self._put(data, block, timeout)
+
+    def dequeue(self, block=True, timeout=None):
+        return self._get(block, timeout)
+
+    def enqueue_many(self, items, block=True, timeout=None):
+        return self._put_many(items, block, timeout)
+
+    def dequeue_many(self, max_items, block=True, timeout=None):
+        return self._get_many(max_items, block, timeout)
+
+    def get_front(self):
+        return self._peek()
+
+class BlockingStack(BlockingContainer):
+    container_class = Stack
+
+    def _methods(self):
+        return self.container.push, self.container.pop, self.container.peek
+
+    def push(self, data, block=True, timeout=None):
+        self._put(data, block, timeout)
+
+    def pop(self, block=True, timeout=None):
+        return self._get(block, timeout)
+
+    def push_many(self, items, block=True, timeout=None):
+        return self._put_many(items, block, timeout)
+
+    def pop_many(self, max_items, block=True, timeout=None):
+        return self._get_many(max_items, block, timeout)
+
+    def peek(self):
+        return self._peek()
+
+'''
+The asyncio counterparts use asyncio.Condition, so a coroutine waiting in dequeue/pop suspends and lets the
+event loop run other tasks instead of blocking the thread. They are meant to be used from a single event loop;
+timeout is in seconds and raises asyncio.TimeoutError. As in the blocking versions, a *_many call that times
+out after adding some items returns how many it added instead of raising.
+'''
+import asyncio
+
+class AsyncContainer:
+    container_class = None
+
+    def __init__(self, maxsize=0, container_class=None):
+        if container_class is not None:
+            self.container_class = container_class
+        self.container = self.container_class()
+        self.maxsize = maxsize
+        self.condition = asyncio.Condition()
+
+    def _methods(self):
+        raise NotImplementedError
+
+    def _is_full(self):
+        return self.maxsize > 0 and len(self.container) >= self.maxsize
+
+    async def _wait(self, ready, timeout):
+        await asyncio.wait_for(self.condition.wait_for(ready), timeout)
+
+    async def _put_many(self, items, timeout):
+        put = self._methods()[0]
+        count = 0
+        async with self.condition:
+            for data in items:
+                try:
+                    await self._wait(lambda: not self._is_full(), timeout)
+                except asyncio.TimeoutError:
+                    if count == 0:
+                        raise
+                    break
+                put(data)
+                count += 1
+                self.condition.notify_all()
+        return count
 
-cur_time = 0
-num_processes_done = 0
-wait_stack = Stack()
-cur_pid = None
+    async def _get_many(self, max_items, timeout):
+        get = self._methods()[1]
+        async with self.condition:
+            await self._wait(lambda: len(self.container) > 0, timeout)
+            ret = []
+            while len(self.container) > 0 and len(ret) < max_items:
+                ret.append(get())
+            self.condition.notify_all()
+            return ret
 
+    def __len__(self):
+        return len(self.container)
+
+class AsyncQueue(AsyncContainer):
+    container_class = Queue
+
+    def _methods(self):
+        return self.container.enqueue, self.container.dequeue
+
+    async def enqueue(self, data, timeout=None):
+        await self._put_many([data], timeout)
+
+    async def dequeue(self, timeout=None):
+        return (await self._get_many(1, timeout))[0]
+
+    async def enqueue_many(self, items, timeout=None):
+        return await self._put_many(items, timeout)
+
+    async def dequeue_many(self, max_items, timeout=None):
+        return await self._get_many(max_items, timeout)
+
+    def get_front(self):
+        return self.container.get_front()
+
+class AsyncStack(AsyncContainer):
+    container_class = Stack
+
+    def _methods(self):
+        return self.container.push, self.container.pop
+
+    async def push(self, data, timeout=None):
+        await self._put_many([data], timeout)
 
-while num_processes_done < processes.shape[0]:
-    # If cur_pid is not None, then we check whether its starting time plus its duration are equal to cur_time. 
-    # If they are, it means the process is done executing. We can then set the end time of this process to cur_time 
-    # and set cur_pid to None to free the processor.
-    if cur_pid is not None:
-        if processes.loc[cur_pid, "Start"] + processes.loc[cur_pid, "Duration"] == cur_time:
-            processes.loc[cur_pid, "End"] = cur_time
-            cur_pid = None
-            num_processes_done += 1
-    # Find all processes with arrival time equal to cur_time and add them to the wait_stack.
-    ready_processes = processes[processes["Arrival"] == cur_time]
-    for pid, _ in ready_processes.iterrows():
-        wait_stack.push(pid)
-    # If the processor is free, that is, cur_pid is None, and there are processes waiting in the stack then remove the 
-    # process at the top of the stack and assign it to cur_pid. We also need to set its start time to cur_time.
-    if cur_pid is None and len(wait_stack) > 0:
-        cur_pid = wait_stack.pop()
-        processes.loc[cur_pid, "Start"] = cur_time 
-    cur_time += 1
+    async def pop(self, timeout=None):
+        return (await self._get_many(1, timeout))[0]
 
-processes["Wait"] = processes["Start"] - processes["Arrival"]
-average_wait_time = processes["Wait"].mean()
+    async def push_many(self, items, timeout=None):
+        return await self._put_many(items, timeout)
 
-fcfs_max_wait = processes["FCFS Wait"].max()
-lcfs_max_wait = processes["Wait"].max()
+    async def pop_many(self, max_items, timeout=None):
+        return await self._get_many(max_items, timeout)
 
-processes["Turnaround"] = processes["End"] - processes["Arrival"]
-average_turnaround_time = processes["Turnaround"].mean()
+    def peek(self):
+        return self.container.peek()
 
 
 
@@ -276,15 +1088,112 @@ However, some keys must be mapped to the same bucket index because there are inf
 a finite number of buckets. This is called a "collision". "Separate chaining" can be used to overcome this. 
 Separate chaining consists of using a list to store the elements in each bucket. Because the list elements do not
 need to be accessed by index, linked list will provide superior performance.
+
+Resizing: the Dictionary keeps its load factor N / B between min_load and max_load.
+•When N / B goes above max_load (0.75) the number of buckets grows to the next prime at least twice as large.
+When it drops below min_load the number of buckets shrinks to the next prime at least half as large,
+but never below the initial number of buckets.
+•Moving every entry to the new buckets at once would stall a single put for O(N) time. Instead the rehash is
+incremental: the new buckets are allocated, and every following put or delete moves the entries of a few
+old buckets (REHASH_STEP) over to them. Lookups and iteration never move entries, so it is safe to read
+values while iterating over the dictionary.
+•While a rehash is in progress, a key whose old bucket index has not been moved yet is still in the old
+buckets, and any other key is in the new ones. New keys can be added to either, because unmoved old
+buckets are moved later anyway.
+•Moving REHASH_STEP = 4 buckets per operation finishes a growth rehash long before the new buckets
+themselves reach max_load.
 '''
 
+# An entry holds one key-value pair stored in a bucket
+class Entry:
+    __slots__ = ("key", "value")
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+
+# Marks a missing default argument, so that None can still be passed as a default
+_MISSING = object()
+
+# Returns the smallest prime number greater than or equal to n
+def next_prime(n):
+    n = max(2, n)
+    while True:
+        divisor = 2
+        while divisor * divisor <= n and n % divisor != 0:
+            divisor += 1
+        if divisor * divisor > n:
+            return n
+        n += 1
+
 class Dictionary:
+    REHASH_STEP = 4
     
-    def __init__(self, num_buckets):
+    def __init__(self, num_buckets=11, max_load=0.75, min_load=0.1):
         # Initializes a linked list instance for each bucket
-        self.num_buckets = num_buckets
-        self.buckets = [LinkedList() for _ in range(num_buckets)]
+        self.num_buckets = next_prime(num_buckets)
+        self.buckets = [LinkedList() for _ in range(self.num_buckets)]
         self.length = 0
+        self.min_buckets = self.num_buckets
+        self.max_load = max_load
+        self.min_load = min_load
+        # Target buckets of an incremental rehash, None when no rehash is in progress
+        self.new_buckets = None
+        self.new_num_buckets = 0
+        self.rehash_index = 0
+    # Load factor of the dictionary, counting the buckets it is growing or shrinking to during a rehash
+    @property
+    def load_factor(self):
+        if self.new_buckets is not None:
+            return self.length / self.new_num_buckets
+        return self.length / self.num_buckets
+    '''
+    Returns the bucket list and the index within it where key is (or should be added).
+    hashcode can be passed in when the caller has already hashed the key.
+    '''
+    def _locate(self, key, hashcode=None):
+        if hashcode is None:
+            hashcode = hash(key)
+        index = hashcode % self.num_buckets
+        if self.new_buckets is None or index >= self.rehash_index:
+            return self.buckets, index
+        return self.new_buckets, hashcode % self.new_num_buckets
+    '''
+    Allocates the new buckets and starts an incremental rehash, if the load factor is out of range.
+    Adding an entry can only raise the load factor, so only removals (shrinking=True) check whether to shrink.
+    Otherwise the first put after reserve() would shrink the buckets it had just sized for a bulk load.
+    '''
+    def _check_load(self, shrinking=False):
+        if self.new_buckets is not None:
+            return
+        if not shrinking:
+            if self.length <= self.max_load * self.num_buckets:
+                return
+            new_num_buckets = next_prime(2 * self.num_buckets)
+        elif self.length < self.min_load * self.num_buckets and self.num_buckets > self.min_buckets:
+            new_num_buckets = max(self.min_buckets, next_prime(self.num_buckets // 2))
+        else:
+            return
+        self.new_num_buckets = new_num_buckets
+        self.new_buckets = [LinkedList() for _ in range(new_num_buckets)]
+        self.rehash_index = 0
+    '''
+    Moves the entries of the next REHASH_STEP old buckets to the new buckets.
+    Once every old bucket has been moved, the new buckets replace the old ones.
+    '''
+    def _rehash_step(self):
+        stop = min(self.rehash_index + self.REHASH_STEP, self.num_buckets)
+        for index in range(self.rehash_index, stop):
+            for entry in self.buckets[index]:
+                self.new_buckets[hash(entry.key) % self.new_num_buckets].append(entry)
+            self.buckets[index] = None
+        self.rehash_index = stop
+        if stop == self.num_buckets:
+            self.buckets = self.new_buckets
+            self.num_buckets = self.new_num_buckets
+            self.new_buckets = None
+            self.new_num_buckets = 0
+            self.rehash_index = 0
     # The process of transforming an object into an integer is called hashing. 
     # The transformation function is called a hash function and the result it called hash code
     # For example, you can convert a string into hash code
@@ -294,59 +1203,182 @@ class Dictionary:
         hashcode = hash(key)
         return hashcode % self.num_buckets
     '''
-    Use the _get_index() method to calculate the index of the bucket for the provided key. Assign it to a variable named index.
-    Declare a boolean value named found_key initially set to False.
-    Use a for loop to iterate over all entries in self.buckets[index] using a variable named entry. For each entry, check whether entry 
-    key is equal to key. If it is, update entry.value to value and set found_key to True.
+    The single probe used by every operation. Finds the bucket of key and walks its nodes until the first
+    entry whose key matches. Keys are unique within a bucket, so there is no need to look any further.
+    Returns the bucket and the matching node, or None if key is not in the dictionary.
+    Operations that modify the dictionary pass write=True, which first moves a few buckets along
+    if a rehash is in progress.
+    '''
+    def _find(self, key, hashcode=None, write=False):
+        if write and self.new_buckets is not None:
+            self._rehash_step()
+        buckets, index = self._locate(key, hashcode)
+        bucket = buckets[index]
+        node = bucket.head
+        while node is not None:
+            if node.data.key == key:
+                return bucket, node
+            node = node.next
+        return bucket, None
+    '''
+    Use the _find() method to look for the node of key in its bucket.
+    If it is found, update its entry value and stop.
+    Otherwise use the Entry() constructor to create a new entry with the provided key and value,
+    append it to the bucket and increment self.length.
+    Grow the buckets if the load factor is now too high.
     '''   
-    def put(self, key, value):
-        index = self._get_index(key)
-        found_key = False
-        for entry in self.buckets[index]:
-            if entry.key == key:
-                entry.value = value
-                found_key = True
-        '''
-        After the for loop, check whether found_key is False. If it is:
-        Use the Entry() constructor to create a new entry with the provided key and value.
-        Append the new entry to self.buckets[index].
-        Update the length of the dictionary by incrementing self.length.
-        '''
-        if not found_key:
-            self.buckets[index].append(Entry(key, value))
-            self.length += 1
-    '''
-    Use the _get_index() method to calculate the index of the bucket for the provided key. Assign it to a variable named index.
-    Use a for loop to iterate over all entries in self.buckets[index] using a variable named entry. For each entry, check whether 
-    entry.key is equal to key. If it is, return entry.value.
+    def put(self, key, value, hashcode=None):
+        bucket, node = self._find(key, hashcode, write=True)
+        if node is not None:
+            node.data.value = value
+            return
+        bucket.append(Entry(key, value))
+        self.length += 1
+        self._check_load()
+    '''
+    Use the _find() method to look for the node of key and return its value.
+    Raise a KeyError with argument key if no matching key is found.
     '''       
     def get_value(self, key):
-        index = self._get_index(key)
-        for entry in self.buckets[index]:
-            if entry.key == key:
-                return entry.value
-        '''
-        After the for loop, raise a KeyError with argument key. Note that because of the return statement inside the for loop, 
-        this line of code is only executed if no matching key is found.
-        '''
-        raise KeyError(key)
-    '''
-    Calculate the bucket index of the given key.
-    Create an empty linked list.
-    Iterate over all entries in that bucket and append to the new linked list all entries whose key is different from the key 
-    that we want to delete.
-    Update the length of the dictionary. We need to decrement it if the new list has fewer elements than the original bucket.
-    We replace the list from the bucket with the new list.
+        node = self._find(key)[1]
+        if node is None:
+            raise KeyError(key)
+        return node.data.value
+    '''
+    Use the _find() method to look for the node of key. If it is found, unlink it from the bucket in place
+    with LinkedList.remove_node, which only updates the prev and next pointers of its neighbours.
+    Update the length of the dictionary and shrink the buckets if the load factor is now too low.
+    Deleting a key that is not in the dictionary does nothing.
     '''
     def delete(self, key):
-        index = self._get_index(key)
-        new_bucket = LinkedList()
-        for entry in self.buckets[index]:
-            if entry.key != key:
-                new_bucket.append(entry)
-        if len(new_bucket) < len(self.buckets[index]):
-            self.length -= 1
-        self.buckets[index] = new_bucket
+        self.pop(key, None)
+    '''
+    Removes key and returns its value. If key is missing, returns default when one is given
+    and raises KeyError otherwise.
+    '''
+    def pop(self, key, default=_MISSING):
+        bucket, node = self._find(key, write=True)
+        if node is None:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        value = node.data.value
+        bucket.remove_node(node)
+        self.length -= 1
+        self._check_load(shrinking=True)
+        return value
+    '''
+    Returns the value of key, first adding it with value default if it is missing.
+    '''
+    def setdefault(self, key, default=None):
+        bucket, node = self._find(key, write=True)
+        if node is not None:
+            return node.data.value
+        bucket.append(Entry(key, default))
+        self.length += 1
+        self._check_load()
+        return default
+    '''
+    Replaces the value of key with fn(old value) and returns it. If key is missing, fn receives None and
+    key is added with the result. The key is looked up once, and if fn raises the dictionary is unchanged.
+    '''
+    def compute(self, key, fn):
+        bucket, node = self._find(key, write=True)
+        if node is not None:
+            node.data.value = fn(node.data.value)
+            return node.data.value
+        value = fn(None)
+        bucket.append(Entry(key, value))
+        self.length += 1
+        self._check_load()
+        return value
+    '''
+    Allows the use of the in operator: key in d
+    '''
+    def __contains__(self, key):
+        return self._find(key)[1] is not None
+    '''
+    Allows the use of del d[key]. Unlike delete(), raises KeyError if key is missing.
+    '''
+    def __delitem__(self, key):
+        self.pop(key)
+    '''
+    Makes room for count entries in total. Finishes any rehash in progress and, if the load factor would
+    go above max_load, rehashes everything once to a prime number of buckets large enough for count.
+    Bulk loads call this first so that they never trigger a chain of growth rehashes.
+    '''
+    def reserve(self, count):
+        while self.new_buckets is not None:
+            self._rehash_step()
+        if count <= self.max_load * self.num_buckets:
+            return
+        self.new_num_buckets = next_prime(int(count / self.max_load) + 1)
+        self.new_buckets = [LinkedList() for _ in range(self.new_num_buckets)]
+        self.rehash_index = 0
+        while self.new_buckets is not None:
+            self._rehash_step()
+    '''
+    Adds every (key, value) pair. The buckets are sized once for all the pairs up front,
+    and each key is hashed only once.
+    '''
+    def put_many(self, pairs):
+        if not hasattr(pairs, "__len__"):
+            pairs = list(pairs)
+        self.reserve(self.length + len(pairs))
+        for key, value in pairs:
+            self.put(key, value, hash(key))
+    '''
+    Adds the entries of a mapping (anything with an items() method, including Dictionary)
+    or of an iterable of (key, value) pairs.
+    '''
+    def update(self, mapping_or_pairs):
+        if hasattr(mapping_or_pairs, "items"):
+            mapping_or_pairs = mapping_or_pairs.items()
+        self.put_many(mapping_or_pairs)
+    '''
+    Returns a list with the value of each key. Missing keys raise KeyError, or give default when one is given.
+    '''
+    def get_many(self, keys, default=_MISSING):
+        values = []
+        for key in keys:
+            node = self._find(key)[1]
+            if node is not None:
+                values.append(node.data.value)
+            elif default is _MISSING:
+                raise KeyError(key)
+            else:
+                values.append(default)
+        return values
+    '''
+    Generator over every entry. During a rehash the moved entries are in the new buckets and
+    the others are in the old buckets from rehash_index onwards.
+    '''
+    def _entries(self):
+        if self.new_buckets is not None:
+            for bucket in self.new_buckets:
+                yield from bucket
+            for index in range(self.rehash_index, self.num_buckets):
+                yield from self.buckets[index]
+        else:
+            for bucket in self.buckets:
+                yield from bucket
+    '''
+    keys(), values() and items() return views: small objects that walk the buckets each time they are
+    iterated instead of copying the entries into a new list.
+    '''
+    def keys(self):
+        return DictionaryView(self, "keys")
+
+    def values(self):
+        return DictionaryView(self, "values")
+
+    def items(self):
+        return DictionaryView(self, "items")
+    # Iterating over a Dictionary gives its keys, like a standard dict
+    def __iter__(self):
+        for entry in self._entries():
+            yield entry.key
+
     '''
     When we use the bracket notation d["my key"], Python tries to call the __getitem__() 
     method by providing "my key" as argument. Therefore, to make this work, we can implement 
@@ -368,3 +1400,551 @@ class Dictionary:
     def __len__(self):
         return self.length
 
+
+'''
+A view over the keys, values or items of a Dictionary. It holds no data of its own, so it always
+reflects the current contents of the dictionary.
+'''
+class DictionaryView:
+
+    def __init__(self, dictionary, kind):
+        self.dictionary = dictionary
+        self.kind = kind
+
+    def __len__(self):
+        return len(self.dictionary)
+
+    def __iter__(self):
+        if self.kind == "keys":
+            for entry in self.dictionary._entries():
+                yield entry.key
+        elif self.kind == "values":
+            for entry in self.dictionary._entries():
+                yield entry.value
+        else:
+            for entry in self.dictionary._entries():
+                yield entry.key, entry.value
+    # Membership is a key lookup for keys views and a scan otherwise
+    def __contains__(self, item):
+        if self.kind == "keys":
+            return item in self.dictionary
+        return any(value == item for value in self)
+
+'''
+Open addressing stores every entry directly in the bucket array instead of in a linked list per bucket.
+•The table is three parallel arrays: hashes (an array.array of 64-bit ints), keys and values. An entry is a slot
+index into all three, so there is no LinkedList, Node or Entry object per key.
+•The capacity is a power of two, so the compression function is h & (capacity - 1) instead of h % B.
+•Linear probing: if the slot of a key is taken by another key, try the next slot, wrapping around at the end,
+until the key or an empty slot is found. The stored hash is compared first, so keys are only compared
+(which may call __eq__) when the hashes match.
+•Deleting cannot simply empty a slot, because that would cut the probe sequence of keys stored after it.
+The slot is marked with a DELETED tombstone instead: lookups skip over it, and put reuses it.
+•Probing gets slow as the table fills, so the table is rebuilt at twice the capacity when used slots plus
+tombstones pass max_load. Rebuilding also drops all tombstones.
+'''
+EMPTY = object()
+DELETED = object()
+
+class OpenDictionary:
+
+    def __init__(self, capacity=16, max_load=0.66):
+        size = 8
+        while size < capacity:
+            size *= 2
+        self.max_load = max_load
+        self._allocate(size)
+        self.length = 0
+    '''
+    Creates empty parallel arrays with size slots.
+    '''
+    def _allocate(self, size):
+        self.capacity = size
+        self.mask = size - 1
+        self.hashes = array.array("q", [0]) * size
+        self.keys = [EMPTY] * size
+        self.values = [None] * size
+        self.filled = 0
+    '''
+    Returns the slot holding key, or -1 if key is not in the table.
+    Stops at the first empty slot, which ends the probe sequence.
+    '''
+    def _find(self, key, hashcode):
+        keys = self.keys
+        hashes = self.hashes
+        mask = self.mask
+        index = hashcode & mask
+        while True:
+            slot_key = keys[index]
+            if slot_key is EMPTY:
+                return -1
+            if slot_key is not DELETED and hashes[index] == hashcode and (slot_key is key or slot_key == key):
+                return index
+            index = (index + 1) & mask
+    '''
+    Rebuilds the table with new_size slots, inserting every live entry again.
+    '''
+    def _resize(self, new_size):
+        old_hashes, old_keys, old_values = self.hashes, self.keys, self.values
+        self._allocate(new_size)
+        for index in range(len(old_keys)):
+            key = old_keys[index]
+            if key is not EMPTY and key is not DELETED:
+                hashcode = old_hashes[index]
+                slot = hashcode & self.mask
+                while self.keys[slot] is not EMPTY:
+                    slot = (slot + 1) & self.mask
+                self.hashes[slot] = hashcode
+                self.keys[slot] = key
+                self.values[slot] = old_values[index]
+                self.filled += 1
+    '''
+    Probes for key. Updates the value if found. Otherwise stores the entry in the first tombstone
+    passed on the way, or in the empty slot that ended the probe.
+    '''
+    def put(self, key, value):
+        hashcode = hash(key)
+        keys = self.keys
+        mask = self.mask
+        index = hashcode & mask
+        tombstone = -1
+        while True:
+            slot_key = keys[index]
+            if slot_key is EMPTY:
+                break
+            if slot_key is DELETED:
+                if tombstone < 0:
+                    tombstone = index
+            elif self.hashes[index] == hashcode and (slot_key is key or slot_key == key):
+                self.values[index] = value
+                return
+            index = (index + 1) & mask
+        if tombstone >= 0:
+            index = tombstone
+        else:
+            self.filled += 1
+        self.hashes[index] = hashcode
+        keys[index] = key
+        self.values[index] = value
+        self.length += 1
+        if self.filled > self.max_load * self.capacity:
+            # Grow only if live entries need the room; otherwise rebuilding at the same size clears the tombstones
+            if self.length > self.max_load * self.capacity / 2:
+                self._resize(self.capacity * 2)
+            else:
+                self._resize(self.capacity)
+
+    def get_value(self, key):
+        index = self._find(key, hash(key))
+        if index < 0:
+            raise KeyError(key)
+        return self.values[index]
+    '''
+    Replaces the entry with a tombstone. Like Dictionary.delete, deleting a missing key does nothing.
+    '''
+    def delete(self, key):
+        index = self._find(key, hash(key))
+        if index < 0:
+            return
+        self.keys[index] = DELETED
+        self.values[index] = None
+        self.length -= 1
+
+    def __getitem__(self, key):
+        return self.get_value(key)
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __len__(self):
+        return self.length
+
+'''
+Benchmark: time and memory of the chained Dictionary against OpenDictionary for the same keys.
+'''
+def benchmark_dictionary(dictionary_class, keys):
+    tracemalloc.start()
+    start = time.time()
+    d = dictionary_class()
+    for key in keys:
+        d[key] = key
+    put_time = time.time() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.time()
+    for key in keys:
+        d[key]
+    get_time = time.time() - start
+    return put_time, get_time, memory / len(keys)
+
+import random
+
+if __name__ == "__main__":
+    random.seed(0)
+    keys = [random.randint(0, 10 ** 12) for _ in range(NUM_VALUES)]
+    for dictionary_class in [Dictionary, OpenDictionary]:
+        put_time, get_time, memory = benchmark_dictionary(dictionary_class, keys)
+        print("{}: put {:.3f}s, get {:.3f}s, {:.1f} bytes per key".format(
+            dictionary_class.__name__, put_time, get_time, memory
+        ))
+
+
+'''
+A persistent Dictionary keeps its buckets in a file instead of in memory, so the table can be larger than RAM
+and survives restarts.
+•The file is memory-mapped with mmap. Opening it only reads the fixed-size header, and the operating system
+loads a page of the file only when a lookup touches it, so opening is O(1) and get_value reads just the pages
+of one bucket.
+•File layout: a header, then num_buckets fixed-size slots, then an overflow area.
+    Header: magic, num_buckets, slot_size, length and data_end (where the overflow area ends).
+    Every slot and overflow record starts with: used flag, key hash, key length, value length, next offset.
+•Each bucket's first entry is stored inline in its slot when it fits. Other entries of the same bucket, and
+entries too large for a slot, are appended to the overflow area as records. The slot's next offset starts a
+chain through them, the on-disk version of separate chaining.
+•Keys and values are stored with pickle. Keys are compared by their pickled bytes, and the bucket index comes
+from a blake2b hash of those bytes, because hash() of a str changes between Python processes.
+•Deleting clears the used flag. Updating a value that no longer fits in place deletes the old entry and adds a
+new one, so the overflow area only grows. compact() rewrites the live entries into a new file.
+Crash safety uses an undo journal (path + ".journal"):
+    Before changing any existing bytes, their offsets and old contents are written to the journal and flushed to disk.
+    The changes are then written to the mapped file and flushed.
+    Emptying the journal commits the operation.
+If the process dies in between, opening the file finds a non-empty journal and copies the old bytes back,
+returning the file to its state before the interrupted operation. Bytes appended past data_end need no journal
+entry, because the restored header no longer points to them.
+'''
+import os
+import mmap
+import struct
+import pickle
+import hashlib
+
+class FileDictionary:
+    MAGIC = b"PYDICT01"
+    HEADER = struct.Struct("<8sQIQQ")
+    HEADER_SIZE = 64
+    RECORD = struct.Struct("<BQIIQ")
+    JOURNAL_ENTRY = struct.Struct("<QI")
+
+    def __init__(self, path, num_buckets=1021, slot_size=128, sync=True):
+        self.path = path
+        self.journal_path = path + ".journal"
+        # sync=False skips fsync for speed; the journal still protects against a crash of the process but not of the machine
+        self.sync = sync
+        if not os.path.exists(path):
+            self._create(path, next_prime(num_buckets), slot_size)
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.num_buckets, self.slot_size, _, _ = self.HEADER.unpack_from(self.map, 0)
+        if magic != self.MAGIC:
+            raise ValueError("{} is not a FileDictionary file".format(path))
+        self._recover()
+    '''
+    Writes the header and the empty slots of a new file.
+    '''
+    @classmethod
+    def _create(cls, path, num_buckets, slot_size):
+        if slot_size <= cls.RECORD.size:
+            raise ValueError("slot_size must be larger than {}".format(cls.RECORD.size))
+        data_start = cls.HEADER_SIZE + num_buckets * slot_size
+        with open(path, "wb") as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, num_buckets, slot_size, 0, data_start))
+            file.truncate(data_start)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _header(self):
+        _, _, _, length, data_end = self.HEADER.unpack_from(self.map, 0)
+        return length, data_end
+
+    def _hash(self, key_bytes):
+        return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), "little")
+
+    def _slot_offset(self, hashcode):
+        return self.HEADER_SIZE + (hashcode % self.num_buckets) * self.slot_size
+    '''
+    Walks the chain of a bucket, starting at its slot. Returns (offset, key length, value length) of the
+    entry whose key bytes equal key_bytes, or None. The hash is compared first so that most non-matching
+    entries are skipped without reading their keys.
+    '''
+    def _lookup(self, key_bytes, hashcode):
+        offset = self._slot_offset(hashcode)
+        while offset:
+            used, entry_hash, key_len, value_len, next_offset = self.RECORD.unpack_from(self.map, offset)
+            if used and entry_hash == hashcode and key_len == len(key_bytes):
+                start = offset + self.RECORD.size
+                if self.map[start:start + key_len] == key_bytes:
+                    return offset, key_len, value_len
+            offset = next_offset
+        return None
+
+    def get_value(self, key):
+        key_bytes = pickle.dumps(key)
+        found = self._lookup(key_bytes, self._hash(key_bytes))
+        if found is None:
+            raise KeyError(key)
+        offset, key_len, value_len = found
+        start = offset + self.RECORD.size + key_len
+        return pickle.loads(self.map[start:start + value_len])
+    '''
+    Adds or updates key. The new entry goes into its bucket's slot if the slot is free (or holds the old
+    version of the key) and the entry fits. Otherwise it is appended to the overflow area and linked in
+    right after the slot.
+    '''
+    def put(self, key, value):
+        key_bytes = pickle.dumps(key)
+        value_bytes = pickle.dumps(value)
+        hashcode = self._hash(key_bytes)
+        length, data_end = self._header()
+        slot = self._slot_offset(hashcode)
+        changes = []
+        found = self._lookup(key_bytes, hashcode)
+        if found is None:
+            length += 1
+        elif found[0] != slot:
+            # Old version lives in an overflow record: clear its used flag
+            changes.append((found[0], b"\x00"))
+        used, _, _, _, slot_next = self.RECORD.unpack_from(self.map, slot)
+        payload = key_bytes + value_bytes
+        new_size = None
+        if (not used or (found is not None and found[0] == slot)) and len(payload) <= self.slot_size - self.RECORD.size:
+            changes.append((slot, self.RECORD.pack(1, hashcode, len(key_bytes), len(value_bytes), slot_next) + payload))
+        else:
+            if found is not None and found[0] == slot:
+                changes.append((slot, b"\x00"))
+            record = self.RECORD.pack(1, hashcode, len(key_bytes), len(value_bytes), slot_next) + payload
+            changes.append((data_end, record))
+            changes.append((slot + self.RECORD.size - 8, struct.pack("<Q", data_end)))
+            data_end += len(record)
+            new_size = data_end
+        changes.append((0, self.HEADER.pack(self.MAGIC, self.num_buckets, self.slot_size, length, data_end)))
+        self._apply(changes, new_size)
+    '''
+    Clears the used flag of key's entry. Deleting a key that is not in the dictionary does nothing.
+    '''
+    def delete(self, key):
+        key_bytes = pickle.dumps(key)
+        found = self._lookup(key_bytes, self._hash(key_bytes))
+        if found is None:
+            return
+        length, data_end = self._header()
+        self._apply([
+            (found[0], b"\x00"),
+            (0, self.HEADER.pack(self.MAGIC, self.num_buckets, self.slot_size, length - 1, data_end)),
+        ])
+    '''
+    The crash-safe write path. changes is a list of (offset, bytes).
+    Journal the old contents of every changed region inside the current data, flush the journal,
+    grow the file if new_size is past its end, write the changes, flush the file, then empty the journal.
+    '''
+    def _apply(self, changes, new_size=None):
+        data_end = self._header()[1]
+        with open(self.journal_path, "wb") as journal:
+            for offset, data in changes:
+                if offset < data_end:
+                    old = self.map[offset:offset + len(data)]
+                    journal.write(self.JOURNAL_ENTRY.pack(offset, len(old)) + old)
+            journal.flush()
+            if self.sync:
+                os.fsync(journal.fileno())
+        if new_size is not None and new_size > len(self.map):
+            # Grow by doubling the overflow area, so that appends remap the file O(log n) times
+            self._grow(max(new_size, 2 * len(self.map) - self.HEADER_SIZE - self.num_buckets * self.slot_size))
+        for offset, data in changes:
+            self.map[offset:offset + len(data)] = data
+        self.map.flush()
+        self._clear_journal()
+
+    def _grow(self, size):
+        self.map.close()
+        self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+    def _clear_journal(self):
+        with open(self.journal_path, "wb") as journal:
+            if self.sync:
+                os.fsync(journal.fileno())
+    '''
+    Rolls back an interrupted operation by copying the journaled bytes back into the file.
+    An incomplete last journal entry means the crash happened while writing the journal, before the file
+    itself was changed, so it is skipped.
+    '''
+    def _recover(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "rb") as journal:
+            data = journal.read()
+        position = 0
+        while position + self.JOURNAL_ENTRY.size <= len(data):
+            offset, size = self.JOURNAL_ENTRY.unpack_from(data, position)
+            position += self.JOURNAL_ENTRY.size
+            if position + size > len(data):
+                break
+            self.map[offset:offset + size] = data[position:position + size]
+            position += size
+        self.map.flush()
+        self._clear_journal()
+    '''
+    Generator over (key bytes, value bytes) of every live entry, walking each bucket's chain.
+    '''
+    def _entries(self):
+        for bucket in range(self.num_buckets):
+            offset = self.HEADER_SIZE + bucket * self.slot_size
+            while offset:
+                used, _, key_len, value_len, next_offset = self.RECORD.unpack_from(self.map, offset)
+                if used:
+                    start = offset + self.RECORD.size
+                    yield self.map[start:start + key_len], self.map[start + key_len:start + key_len + value_len]
+                offset = next_offset
+
+    def items(self):
+        for key_bytes, value_bytes in self._entries():
+            yield pickle.loads(key_bytes), pickle.loads(value_bytes)
+    '''
+    Rewrites the live entries into a new file, dropping deleted entries and stale overflow records.
+    num_buckets defaults to a prime that keeps the load factor below 0.75. The new file is fully written and
+    flushed before os.replace swaps it in, and the rename is atomic, so a crash leaves either the old or the
+    new file in place.
+    '''
+    def compact(self, num_buckets=None):
+        if num_buckets is None:
+            num_buckets = max(11, int(len(self) / 0.75) + 1)
+        tmp_path = self.path + ".compact"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        compacted = FileDictionary(tmp_path, num_buckets, self.slot_size, sync=False)
+        for key, value in self.items():
+            compacted.put(key, value)
+        compacted.map.flush()
+        os.fsync(compacted.file.fileno())
+        compacted.close()
+        if os.path.exists(compacted.journal_path):
+            os.remove(compacted.journal_path)
+        self.close()
+        os.replace(tmp_path, self.path)
+        self.__init__(self.path, sync=self.sync)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key):
+        key_bytes = pickle.dumps(key)
+        return self._lookup(key_bytes, self._hash(key_bytes)) is not None
+
+    def __getitem__(self, key):
+        return self.get_value(key)
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __len__(self):
+        return self._header()[0]
+
+
+'''
+Sharing one Dictionary between threads needs a lock, and a single lock around the whole table makes every
+thread wait for every other one. A sharded dictionary splits the keys over several independent Dictionary
+objects (shards), chosen by hash(key) % num_shards, each with its own lock. Threads working on keys in
+different shards never wait for each other.
+•increment() and compute() read, change and write a value while holding the shard's lock, so concurrent
+updates of the same counter are never lost.
+•Reads take the shard's lock too, because a rehash running in another thread moves buckets around and a
+lookup without the lock could read them half-moved. A read only waits for threads using the same shard.
+'''
+
+class ShardedDictionary:
+
+    def __init__(self, num_shards=16, num_buckets=11):
+        self.num_shards = num_shards
+        self.shards = [Dictionary(num_buckets) for _ in range(num_shards)]
+        self.locks = [threading.Lock() for _ in range(num_shards)]
+
+    def _shard(self, key):
+        index = hash(key) % self.num_shards
+        return self.shards[index], self.locks[index]
+
+    def put(self, key, value):
+        shard, lock = self._shard(key)
+        with lock:
+            shard.put(key, value)
+
+    def get_value(self, key):
+        shard, lock = self._shard(key)
+        with lock:
+            return shard.get_value(key)
+
+    def delete(self, key):
+        shard, lock = self._shard(key)
+        with lock:
+            shard.delete(key)
+    '''
+    Adds delta to the value of key (starting from 0 if key is missing) and returns the new value, atomically.
+    '''
+    def increment(self, key, delta=1):
+        return self.compute(key, lambda value: (value or 0) + delta)
+    '''
+    Replaces the value of key with fn(old value) and returns it, atomically. fn receives None when key
+    is missing. fn runs while the shard is locked, so it should be quick and must not use this dictionary.
+    The value is replaced in place, so if fn raises, the old entry is kept.
+    '''
+    def compute(self, key, fn):
+        shard, lock = self._shard(key)
+        with lock:
+            return shard.compute(key, fn)
+    '''
+    Iterates over the items one shard at a time, holding each shard's lock while copying its items.
+    '''
+    def items(self):
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                shard_items = list(shard.items())
+            yield from shard_items
+
+    def __contains__(self, key):
+        try:
+            self.get_value(key)
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, key):
+        return self.get_value(key)
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+'''
+Throughput benchmark: num_threads threads each increment random counters num_operations times.
+Prints operations per second for several shard counts; one shard is equivalent to a single global lock.
+'''
+def benchmark_sharded(num_shards, num_threads=8, num_operations=20000, num_keys=1000):
+    counters = ShardedDictionary(num_shards)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(num_operations):
+            counters.increment(rng.randrange(num_keys))
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(num_threads)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    assert sum(value for _, value in counters.items()) == num_threads * num_operations
+    return num_threads * num_operations / elapsed
+
+if __name__ == "__main__":
+    for num_shards in [1, 4, 16, 64]:
+        print("{} shards: {:.0f} increments per second".format(num_shards, benchmark_sharded(num_shards)))
\ No newline at end of file
@@ -9,7 +9,10 @@ The yield expression:•Lets the Python interpreter know that the function is a
 •Suspends the function execution, keeping the local variables in memory until the next call.
 •Once the final yield in the generator is executed, the generator will have exhausted all of itselements.
 '''
-def parse_log(log):
+def parse_log(log, batch_size=None, as_numpy=False):
+    if batch_size:
+        yield from parse_log_batches(log, batch_size, as_numpy)
+        return
     for line in log:
         split_line = line.split()
         remote_addr = split_line[0]
@@ -26,12 +29,155 @@ def parse_log(log):
         )
 first_line = next(parse_log(log))
 
+'''
+parse_log runs on a single core. For large log files the parsing can be spread over a process pool:
+•The file is split into byte ranges of about chunk_size bytes. Each range is extended to the end of the line it
+stops in, so every line belongs to exactly one range.
+•Each worker opens the file itself, reads only its range and parses it with parse_log. Only the (start, end)
+offsets are sent to the workers, never the data.
+•At most 2 * num_workers ranges are in flight at once, so memory stays bounded for any file size.
+•With ordered=True the tuples are yielded in file order. With ordered=False each chunk is yielded as soon as it
+is parsed, which keeps all workers busy when some chunks take longer than others.
+'''
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import io
+import os
+
+def _chunk_ranges(path, chunk_size):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = min(f.tell(), size)
+            yield start, end
+            start = end
+
+def _parse_chunk(path, start, end):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # StringIO with newline=None splits lines the same way as iterating over a file opened in text mode
+    return list(parse_log(io.StringIO(data.decode('utf-8'), newline=None)))
+
+def parse_log_parallel(path, num_workers=None, chunk_size=16 * 1024 * 1024, ordered=True):
+    num_workers = num_workers or os.cpu_count()
+    ranges = _chunk_ranges(path, chunk_size)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = []
+        for start, end in itertools.islice(ranges, 2 * num_workers):
+            pending.append(executor.submit(_parse_chunk, path, start, end))
+        while pending:
+            if ordered:
+                done = pending.pop(0)
+                lines = done.result()
+            else:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                done = finished.pop()
+                pending.remove(done)
+                lines = done.result()
+            for start, end in itertools.islice(ranges, 1):
+                pending.append(executor.submit(_parse_chunk, path, start, end))
+            yield from lines
+
+'''
+parse_log decodes every line to str and builds eight new strings per line, even when only one field is needed.
+Working on the raw bytes avoids most of that work:
+•The file is memory-mapped, and lines are read from the map as bytes, so no decoding happens while scanning.
+•The fields are whitespace-separated tokens at fixed positions. split(None, maxsplit) stops splitting after
+maxsplit tokens, so only the tokens up to the last requested field are created. For request_type (token 5)
+that is 6 tokens out of the 12 or more on a line, and the user agent is never joined.
+•Only the requested fields are decoded, and only if decode=True.
+•count_field does not build a tuple per line at all. It counts the raw bytes of one token with a Counter and
+decodes just the distinct values at the end.
+'''
+import mmap
+from collections import Counter
+
+LOG_FIELDS = [
+    'ip', 'time_local', 'request_type',
+    'request_path', 'status', 'bytes_sent',
+    'http_referrer', 'http_user_agent'
+]
+# Token range of each field on a whitespace-split line; the user agent runs to the end of the line
+FIELD_TOKENS = {
+    'ip': (0, 1), 'time_local': (3, 5), 'request_type': (5, 6),
+    'request_path': (6, 7), 'status': (8, 9), 'bytes_sent': (9, 10),
+    'http_referrer': (10, 11), 'http_user_agent': (11, None),
+}
+
+def _mapped_lines(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter(mm.readline, b'')
+
+def parse_log_fields(path, fields=('request_type',), decode=True):
+    ranges = [FIELD_TOKENS[field] for field in fields]
+    if any(stop is None for _, stop in ranges):
+        maxsplit = 11
+    else:
+        maxsplit = max(stop for _, stop in ranges)
+    for line in _mapped_lines(path):
+        tokens = line.split(None, maxsplit)
+        record = []
+        for start, stop in ranges:
+            if stop is None:
+                value = b' '.join(tokens[start].split())
+            elif stop == start + 1:
+                value = tokens[start]
+            else:
+                value = b' '.join(tokens[start:stop])
+            record.append(value.decode('utf-8') if decode else value)
+        yield tuple(record)
+
+def count_field(path, field='request_type'):
+    start, stop = FIELD_TOKENS[field]
+    if stop == start + 1:
+        counts = Counter(line.split(None, stop)[start] for line in _mapped_lines(path))
+    else:
+        counts = Counter(values[0] for values in parse_log_fields(path, [field], decode=False))
+    return ((k.decode('utf-8'), v) for k, v in counts.items())
+
+'''
+With batch_size set, parse_log yields batches in column layout instead of one tuple per line: a dictionary
+mapping each field name in LOG_FIELDS to a list with that field for up to batch_size lines.
+•status and bytes_sent are converted to integers ('-', which the log uses for no body, becomes 0).
+•With as_numpy=True every column is a NumPy array, so aggregations can run on a whole batch at once,
+for example np.unique(batch['request_type'], return_counts=True) or batch['bytes_sent'].sum().
+'''
+INT_FIELDS = ('status', 'bytes_sent')
+
+def _to_int(value):
+    return 0 if value == '-' else int(value)
+
+def parse_log_batches(log, batch_size=65536, as_numpy=False):
+    if as_numpy:
+        import numpy as np
+    lines = parse_log(log)
+    while True:
+        rows = list(itertools.islice(lines, batch_size))
+        if not rows:
+            return
+        batch = {}
+        for field, column in zip(LOG_FIELDS, zip(*rows)):
+            if field in INT_FIELDS:
+                column = list(map(_to_int, column))
+            else:
+                column = list(column)
+            batch[field] = np.asarray(column) if as_numpy else column
+        yield batch
+
 def build_csv(lines, file, header=None):
     if header:
         lines = itertools.chain([header], lines)
     writer = csv.writer(file, delimiter=',')
     writer.writerows(lines)
-    file.seek(0)
+    # Rewind so the caller can read the file back; pipes and compressed streams cannot be rewound
+    if file.seekable():
+        file.seek(0)
     return file
 
 file = open('temporary.csv', 'r+')
@@ -58,6 +204,456 @@ def count_unique_request(csv_file):
         uniques[line[idx]] += 1
     return ((k, v) for k,v in uniques.items())
 
+'''
+count_unique_request only needs one column, but to get it the pipeline above writes every parsed line to a CSV
+file, rewinds it and parses the CSV again. count_unique counts straight from what parse_log yields instead:
+•records can be the tuples from parse_log or the column batches from parse_log(log, batch_size=...).
+•Tuples are counted with a Counter over operator.itemgetter, which runs the loop in C. Batches update the
+Counter with a whole column at a time.
+•Nothing is kept in memory except the counts. Writing the raw CSV is optional: pass a csv_file and the rows are
+written to it as they stream past, without it ever being read back.
+'''
+import operator
+
+def _write_rows(records, writer):
+    for record in records:
+        writer.writerow(record)
+        yield record
+
+def count_unique(records, field='request_type', csv_file=None):
+    writer = None
+    if csv_file is not None:
+        writer = csv.writer(csv_file, delimiter=',')
+        writer.writerow(LOG_FIELDS)
+    records = iter(records)
+    first = next(records, None)
+    if first is None:
+        return iter(())
+    records = itertools.chain([first], records)
+    if isinstance(first, dict):
+        uniques = Counter()
+        for batch in records:
+            column = batch[field]
+            uniques.update(column.tolist() if hasattr(column, 'tolist') else column)
+            if writer is not None:
+                writer.writerows(zip(*(batch[name] for name in LOG_FIELDS)))
+    else:
+        if writer is not None:
+            records = _write_rows(records, writer)
+        uniques = Counter(map(operator.itemgetter(LOG_FIELDS.index(field)), records))
+    return ((k, v) for k, v in uniques.items())
+
+'''
+count_unique only counts one column. GroupBy generalizes it to any number of aggregations per group,
+for example requests, total bytes_sent, 95th percentile of bytes_sent and distinct ips for each status.
+•An aggregator holds the running state of one aggregation for one group and has four methods:
+add(value) folds in one value, update(values) folds in a whole column, merge(other) combines two partial
+states, and result() returns the answer. empty() returns a new empty aggregator with the same settings.
+•Count, Sum, Min and Max are exact and use O(1) memory.
+•DistinctCount is a HyperLogLog sketch. Each value is hashed, the first p bits of the hash choose one of
+2 ** p registers, and the register keeps the longest run of leading zeros seen in the remaining bits.
+The count is estimated from the registers with about 1.04 / sqrt(2 ** p) relative error, in 2 ** p bytes.
+•Quantile is a DDSketch-style log histogram. A positive value x goes to bucket ceil(log(x) / log(gamma)),
+so every value in a bucket is within relative_accuracy of the bucket's representative value. At most
+max_buckets buckets are kept; beyond that the lowest buckets are collapsed, which only affects the
+lowest quantiles.
+•Every aggregator can be merged, and so can a GroupBy, so parallel workers can each aggregate part of
+the log and the parent combines their results (see aggregate_parallel).
+'''
+import math
+import hashlib
+
+class Aggregator:
+
+    def __init__(self, field=None):
+        self.field = field
+
+    def empty(self):
+        raise NotImplementedError
+
+    def add(self, value):
+        raise NotImplementedError
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+# Counts rows; field is not needed
+class Count(Aggregator):
+
+    def __init__(self, field=None):
+        super().__init__(field)
+        self.count = 0
+
+    def empty(self):
+        return Count(self.field)
+
+    def add(self, value):
+        self.count += 1
+
+    def update(self, values):
+        self.count += len(values)
+
+    def merge(self, other):
+        self.count += other.count
+
+    def result(self):
+        return self.count
+
+class Sum(Aggregator):
+
+    def __init__(self, field):
+        super().__init__(field)
+        self.total = 0
+
+    def empty(self):
+        return Sum(self.field)
+
+    def add(self, value):
+        self.total += value
+
+    def update(self, values):
+        self.total += sum(values)
+
+    def merge(self, other):
+        self.total += other.total
+
+    def result(self):
+        return self.total
+
+class Min(Aggregator):
+
+    def __init__(self, field):
+        super().__init__(field)
+        self.value = None
+
+    def empty(self):
+        return Min(self.field)
+
+    def add(self, value):
+        if self.value is None or value < self.value:
+            self.value = value
+
+    def update(self, values):
+        if len(values):
+            self.add(min(values))
+
+    def merge(self, other):
+        if other.value is not None:
+            self.add(other.value)
+
+    def result(self):
+        return self.value
+
+class Max(Min):
+
+    def empty(self):
+        return Max(self.field)
+
+    def add(self, value):
+        if self.value is None or value > self.value:
+            self.value = value
+
+    def update(self, values):
+        if len(values):
+            self.add(max(values))
+
+class DistinctCount(Aggregator):
+
+    def __init__(self, field, precision=12):
+        super().__init__(field)
+        self.precision = precision
+        self.registers = bytearray(2 ** precision)
+
+    def empty(self):
+        return DistinctCount(self.field, self.precision)
+    # blake2b rather than hash(), whose value for a str differs between processes and would break merging
+    def add(self, value):
+        hashcode = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+        index = hashcode >> (64 - self.precision)
+        rest = hashcode & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        registers = self.registers
+        for index, rank in enumerate(other.registers):
+            if rank > registers[index]:
+                registers[index] = rank
+    '''
+    The HyperLogLog estimate, with the usual linear counting correction when many registers are still empty.
+    '''
+    def result(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+class Quantile(Aggregator):
+
+    def __init__(self, field, q=0.5, relative_accuracy=0.01, max_buckets=2048):
+        super().__init__(field)
+        self.q = q
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def empty(self):
+        return Quantile(self.field, self.q, self.relative_accuracy, self.max_buckets)
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            # Log buckets only cover positive values; bytes_sent and status never go below zero
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+    # Folds the lowest buckets into one so that at most max_buckets remain
+    def _collapse(self):
+        indexes = sorted(self.buckets)
+        excess = indexes[:len(indexes) - self.max_buckets + 1]
+        total = sum(self.buckets.pop(index) for index in excess)
+        target = excess[-1]
+        self.buckets[target] = self.buckets.get(target, 0) + total
+
+    def merge(self, other):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def result(self):
+        if self.count == 0:
+            return None
+        rank = self.q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+
+'''
+Groups records by one or more fields and feeds every group's aggregators.
+by is a field name or a list of field names, aggregators maps an output name to an aggregator that is used
+as a template (empty() is called on it for each new group).
+'''
+class GroupBy:
+
+    def __init__(self, by, aggregators):
+        self.by = [by] if isinstance(by, str) else list(by)
+        self.aggregators = aggregators
+        self.groups = {}
+
+    def empty(self):
+        return GroupBy(self.by, self.aggregators)
+
+    def _group(self, key):
+        group = self.groups.get(key)
+        if group is None:
+            group = {name: aggregator.empty() for name, aggregator in self.aggregators.items()}
+            self.groups[key] = group
+        return group
+    '''
+    Adds parse_log tuples. status and bytes_sent are converted to integers, as in the column batches,
+    so that groups built from tuples and from batches can be merged.
+    '''
+    def add_rows(self, rows):
+        key_indexes = [LOG_FIELDS.index(field) for field in self.by]
+        fields = [(name, aggregator.field) for name, aggregator in self.aggregators.items()]
+        key_int = [field in INT_FIELDS for field in self.by]
+        for row in rows:
+            key = tuple(
+                _to_int(row[index]) if is_int else row[index]
+                for index, is_int in zip(key_indexes, key_int)
+            )
+            group = self._group(key if len(key) > 1 else key[0])
+            for name, field in fields:
+                if field is None:
+                    value = None
+                else:
+                    value = row[LOG_FIELDS.index(field)]
+                    if field in INT_FIELDS:
+                        value = _to_int(value)
+                group[name].add(value)
+    '''
+    Adds one column batch. The rows of the batch are first split into groups by position, then each
+    aggregator receives all of its group's values in one update() call.
+    NumPy columns (as_numpy=True) are converted with tolist() first, so the keys and results are Python ints
+    and strs, as with tuples, rather than np.int64 and np.str_.
+    '''
+    def add_batch(self, batch):
+        fields = set(self.by) | {aggregator.field for aggregator in self.aggregators.values() if aggregator.field}
+        batch = {
+            field: batch[field].tolist() if hasattr(batch[field], 'tolist') else batch[field]
+            for field in fields
+        }
+        keys = list(zip(*(batch[field] for field in self.by)))
+        positions = {}
+        for position, key in enumerate(keys):
+            positions.setdefault(key if len(key) > 1 else key[0], []).append(position)
+        for key, rows in positions.items():
+            group = self._group(key)
+            for name, aggregator in self.aggregators.items():
+                if aggregator.field is None:
+                    group[name].update(rows)
+                else:
+                    column = batch[aggregator.field]
+                    group[name].update([column[row] for row in rows])
+    # Accepts either parse_log tuples or column batches
+    def add_records(self, records):
+        records = iter(records)
+        first = next(records, None)
+        if first is None:
+            return self
+        records = itertools.chain([first], records)
+        if isinstance(first, dict):
+            for batch in records:
+                self.add_batch(batch)
+        else:
+            self.add_rows(records)
+        return self
+
+    def merge(self, other):
+        for key, other_group in other.groups.items():
+            group = self._group(key)
+            for name, aggregator in other_group.items():
+                group[name].merge(aggregator)
+        return self
+
+    def results(self):
+        return (
+            (key, {name: aggregator.result() for name, aggregator in group.items()})
+            for key, group in self.groups.items()
+        )
+
+'''
+Aggregates a log file in parallel: each worker parses one byte range (see parse_log_parallel) into its own
+empty copy of group_by and returns the partial state, which is merged into the final result.
+As in parse_log_parallel, at most 2 x num_workers chunks are in flight, and each partial state is merged as
+soon as its chunk finishes, so only a few of them are in memory at once however large the log is.
+'''
+def _aggregate_chunk(path, start, end, group_by):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return group_by.empty().add_records(parse_log(io.StringIO(data.decode('utf-8'), newline=None)))
+
+def aggregate_parallel(path, group_by, num_workers=None, chunk_size=16 * 1024 * 1024):
+    num_workers = num_workers or os.cpu_count()
+    ranges = _chunk_ranges(path, chunk_size)
+    result = group_by.empty()
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        pending = set()
+        for start, end in itertools.islice(ranges, 2 * num_workers):
+            pending.add(executor.submit(_aggregate_chunk, path, start, end, group_by))
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for done in finished:
+                result.merge(done.result())
+                for start, end in itertools.islice(ranges, 1):
+                    pending.add(executor.submit(_aggregate_chunk, path, start, end, group_by))
+    return result
+
+'''
+build_csv hands the rows to csv.writer, which writes each row to the file separately, and then calls seek(0),
+which fails on pipes, sockets and compressed streams. write_csv is a bulk writer for large outputs:
+•Rows are formatted by csv.writer into an in-memory buffer, buffer_rows rows at a time, and each buffer is
+encoded and written to the sink in one large write.
+•target is a path or a binary file-like object. For paths, compression is 'gzip' or 'lzma' (standard library
+modules), or None; by default it is chosen from the .gz or .xz extension.
+•rows can be tuples or column batches from parse_log(log, batch_size=...); batches are transposed with zip
+and their columns are read by fields (LOG_FIELDS by default). header is only the line printed at the top.
+A buffer is written out every buffer_rows rows, however those rows arrive, so a large batch is split up.
+•A gzip or lzma stream opened here is always closed, which writes its end-of-stream trailer; closing it
+does not close a file-like target, which is only flushed.
+•The sink is never rewound, so any writable stream works.
+Returns the number of rows, the uncompressed bytes, the elapsed seconds and the rows and bytes written per second.
+'''
+import gzip
+import lzma
+import time
+
+COMPRESSORS = {'gzip': gzip.open, 'lzma': lzma.open}
+
+def _open_sink(target, compression):
+    if compression is None and isinstance(target, (str, os.PathLike)):
+        compression = {'.gz': 'gzip', '.xz': 'lzma'}.get(os.path.splitext(target)[1])
+    if compression is not None:
+        return COMPRESSORS[compression](target, 'wb'), True
+    if isinstance(target, (str, os.PathLike)):
+        return open(target, 'wb'), True
+    return target, False
+
+def _csv_rows(rows, fields):
+    for item in rows:
+        if isinstance(item, dict):
+            yield from zip(*(item[field] for field in fields))
+        else:
+            yield item
+
+def write_csv(rows, target, header=None, compression=None, buffer_rows=10000, encoding='utf-8', fields=LOG_FIELDS):
+    sink, close = _open_sink(target, compression)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=',')
+    num_rows = 0
+    num_bytes = 0
+    start = time.time()
+
+    def flush():
+        nonlocal num_bytes
+        data = buffer.getvalue().encode(encoding)
+        sink.write(data)
+        num_bytes += len(data)
+        buffer.seek(0)
+        buffer.truncate()
+
+    try:
+        if header:
+            writer.writerow(header)
+        rows = _csv_rows(rows, fields)
+        while True:
+            chunk = list(itertools.islice(rows, buffer_rows))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            num_rows += len(chunk)
+            flush()
+        flush()
+    finally:
+        if close:
+            sink.close()
+        if not isinstance(target, (str, os.PathLike)):
+            target.flush()
+    elapsed = max(time.time() - start, 1e-9)
+    return {
+        'rows': num_rows,
+        'bytes': num_bytes,
+        'seconds': elapsed,
+        'rows_per_second': num_rows / elapsed,
+        'bytes_per_second': num_bytes / elapsed,
+    }
+
 
 
 log = open('example_log.txt')
@@ -78,6 +674,26 @@ summarized_file = open('summarized.csv', 'r+')
 summarized_csv = build_csv(uniques, summarized_file, header=['request_type', 'count'])
 print(summarized_file.readlines())
 
+# Streaming version: no CSV round-trip, the raw CSV is only written as a side output
+log = open('example_log.txt')
+uniques = count_unique(parse_log(log), csv_file=open('temporary.csv', 'w', newline=''))
+summarized_file = open('summarized.csv', 'r+')
+summarized_csv = build_csv(uniques, summarized_file, header=['request_type', 'count'])
+print(summarized_file.readlines())
+
+# The partial GroupBy states merged by aggregate_parallel must add up to a single sequential pass
+if __name__ == '__main__':
+    group_by = GroupBy('request_type', {
+        'count': Count(),
+        'bytes': Sum('bytes_sent'),
+        'largest': Max('bytes_sent'),
+        'ips': DistinctCount('ip'),
+        'median_bytes': Quantile('bytes_sent'),
+    })
+    parallel = dict(aggregate_parallel('example_log.txt', group_by, chunk_size=64 * 1024).results())
+    sequential = dict(group_by.empty().add_records(parse_log(open('example_log.txt'))).results())
+    assert parallel == sequential, (parallel, sequential)
+
 import io
 '''
 Logger function logs when function calls are made to
@@ -203,23 +819,92 @@ The number of in-degrees is the total count of edges pointing towards the node.
 '''
 
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextlib
+import functools
+import inspect
+import queue
+import threading
+from collections.abc import Iterator
 
 class DAG:
 
     def __init__(self):
         self.graph = {}
+        # Reverse adjacency: maps each node to the list of nodes pointing to it
+        self.predecessors = {}
+        # A topological order kept up to date on every add(), and each node's index in it
+        self.order = []
+        self.position = {}
+        # Cached tuple copy of self.order handed out by sort(); None once the graph has changed
+        self._sorted = None
     '''
     Add node to self.graph if it isn't already in the graph and default the value to a list.
     If there is a to, add that to the node's list, and add to self.graph defaulting to a list
+    Keep self.predecessors in step, so the nodes pointing to a node can be found in one lookup
+    instead of a scan of the whole graph.
+    New nodes go on the end of self.order. Before an edge is stored, reorder() checks it against
+    the current order, so an edge closing a cycle raises and leaves the graph as it was.
     '''
     def add(self, node, to=None):
-        def add(self, node, to=None):
         if not node in self.graph:
-            self.graph[node] = []
+            self._add_node(node)
         if to:
             if not to in self.graph:
-                self.graph[to] = []
+                self._add_node(to)
+            self.reorder(node, to)
             self.graph[node].append(to)
+            self.predecessors[to].append(node)
+            self._sorted = None
+
+    def _add_node(self, node):
+        self.graph[node] = []
+        self.predecessors[node] = []
+        self.position[node] = len(self.order)
+        self.order.append(node)
+        self._sorted = None
+
+    '''
+    Pearce-Kelly reordering for a new edge node -> to.
+    If node already comes before to, the order still holds and nothing moves.
+    Otherwise only the slice of the order between to and node is affected:
+        Search forward from to, through nodes no later than node. Reaching node means a cycle.
+        Search backward from node, through nodes no earlier than to.
+        Hand the positions those nodes held back out, the backward set first, each set keeping
+        its relative order, so node ends up ahead of to.
+    '''
+    def reorder(self, node, to):
+        lower, upper = self.position[to], self.position[node]
+        if lower > upper:
+            return
+        if node == to:
+            raise Exception("edge {!r} -> {!r} creates a cycle".format(node, to))
+        forward = self._reach(to, self.graph, lambda n: self.position[n] <= upper, node)
+        backward = self._reach(node, self.predecessors, lambda n: self.position[n] >= lower)
+        forward.sort(key=self.position.__getitem__)
+        backward.sort(key=self.position.__getitem__)
+        moved = backward + forward
+        slots = sorted(self.position[n] for n in moved)
+        for n, slot in zip(moved, slots):
+            self.position[n] = slot
+            self.order[slot] = n
+
+    # Depth-first search from start along edges, staying on nodes that pass bound.
+    # Raise if target turns up, since the new edge would then close a cycle.
+    def _reach(self, start, edges, bound, target=None):
+        seen = {start}
+        stack = [start]
+        while stack:
+            current = stack.pop()
+            for n in edges[current]:
+                if n == target:
+                    raise Exception("edge {!r} -> {!r} creates a cycle".format(target, start))
+                if n not in seen and bound(n):
+                    seen.add(n)
+                    stack.append(n)
+        return list(seen)
+
     # The in_degrees() method should create DAG.degrees attribute containing a dictionary mapping of node to number of in-degrees.
     # Loop through every node, and its pointers, and then count each edge to the pointed node.
     def in_degrees(self):
@@ -231,7 +916,17 @@ class DAG:
                 if pointed not in self.degrees:
                     self.degrees[pointed] = 0
                 self.degrees[pointed] += 1
-    
+
+    '''
+    Return the topological order kept by add(), as a tuple.
+    The tuple is cached until the graph next changes, so repeated Pipeline runs don't re-sort, and being
+    immutable, a caller cannot change the order seen by later runs.
+    '''
+    def sort(self):
+        if self._sorted is None:
+            self._sorted = tuple(self.order)
+        return self._sorted
+
     '''
     Filter all the root nodes, and pop them off the graph.
     Search their pointers, and check if they are the new root nodes.
@@ -239,7 +934,7 @@ class DAG:
         If not, then continue.
     Once all the nodes have been popped from the graph, return the list of ordered root nodes.
     '''
-    def sort(self):
+    def kahn_sort(self):
         self.in_degrees()
         to_visit = deque()
         for node in self.graph:
@@ -267,37 +962,94 @@ class DAG:
             searched.append(node)
         return searched
     '''
-    Call sort() in the add() method, and check if the sorted length is greater than the number of nodes in the graph.
+    Full check of the whole graph with kahn_sort(): a sorted length short of the number of nodes
+    means a cycle. add() no longer needs this, since reorder() catches cycles edge by edge.
     Raise Exception if a cycle is detected.
     '''
 
     def cycle_check(self):
-        if len(self.sort()) != len(self.graph):
+        if len(self.kahn_sort()) != len(self.graph):
                 raise Exception
 
-    @cycle_check()           
-    def add(self, node, to=None):
-        return add(self, node, to=None)
 
 
+'''
+A bounded buffer carrying the items of one DAG edge in Pipeline.run_stream().
+put() blocks while the buffer is full, so a producer can only run size items ahead of its consumer.
+Iterating yields items until the producer calls close(). drain() marks the channel abandoned and throws
+away whatever is left, so a consumer that stopped reading early never leaves its producer blocked,
+and the producer can stop once none of its consumers is reading.
+'''
+class Channel:
+    _END = object()
+
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+        self.closed = False
+        self.abandoned = False
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def close(self):
+        self.queue.put(self._END)
+
+    def __iter__(self):
+        while not self.closed:
+            item = self.queue.get()
+            if item is self._END:
+                self.closed = True
+                return
+            yield item
+
+    def drain(self):
+        self.abandoned = True
+        for _ in self:
+            pass
+
 
 class Pipeline():
     def __init__(self):
         self.tasks = DAG()
-        
-    def task(self, depends_on=None):
+        self.executors = {}
+        self.timeouts = {}
+        self.limits = {}
+    '''
+    executor is an optional hint for run_parallel(): 'thread' or 'process'.
+    CPU-bound tasks should use 'process', because threads in one Python process do not run Python code in parallel.
+    timeout (seconds) and limit (the name of a concurrency limit shared by several tasks) apply to run_async().
+    '''
+    def task(self, depends_on=None, executor=None, timeout=None, limit=None):
         def inner(f):
             self.tasks.add(f)
             if depends_on:
                 self.tasks.add(depends_on, f)
+            if executor:
+                self.executors[f] = executor
+            if timeout is not None:
+                self.timeouts[f] = timeout
+            if limit is not None:
+                self.limits[f] = limit
             return f
         return inner
     '''
+    Returns the arguments for task from the outputs of the tasks it depends on.
+    A task with no dependencies is called without arguments, and a task with one dependency receives its output.
+    A task with several dependencies receives a single dictionary mapping each upstream task to its output.
+    '''
+    def _inputs(self, task, completed):
+        upstream = self.tasks.predecessors[task]
+        if not upstream:
+            return ()
+        if len(upstream) == 1:
+            return (completed[upstream[0]],)
+        return ({node: completed[node] for node in upstream},)
+    '''
     Run the tasks.sort() method/
     Initialize a dictionary of completed.
         Iterate through each sorted task:
-        Check every node in the graph, and if the task is referenced, run the task with the proper input and add it to completed.
-        If the task is not referenced, run the task without arguments and add it to completed.
+        Look up its inputs with _inputs(), which reads the DAG's predecessor index instead of checking every
+        node in the graph, run the task with them and add the output to completed.
     Return the completed dictionary.
     '''
     def run(self):
@@ -305,34 +1057,172 @@ class Pipeline():
         completed = {}
         
         for task in scheduled:
-            for node, values in self.tasks.graph.items():
-                if task in values:
-                    completed[task] = task(completed[node])
-            if task not in completed:
-                completed[task] = task()
+            completed[task] = task(*self._inputs(task, completed))
+        return completed
+    '''
+    run() executes the tasks one after another even when branches of the DAG do not depend on each other.
+    run_parallel() starts every task as soon as all the tasks it depends on have finished:
+        Count the unfinished dependencies of each task and submit the tasks with none.
+        Whenever a task finishes, store its output and decrement the count of the tasks it points to.
+        Submit every task whose count reaches 0.
+    Tasks run on a thread pool by default, or on a process pool when their executor hint is 'process'
+    (default_executor changes the default). Outputs are passed between thread tasks as the same objects,
+    without copying; only tasks that run in a process pickle their input and output.
+    Each task receives the same inputs as in run().
+    '''
+    def run_parallel(self, max_workers=None, default_executor='thread'):
+        graph = self.tasks.graph
+        waiting = {task: len(nodes) for task, nodes in self.tasks.predecessors.items()}
+        completed = {}
+        pools = {}
+        running = {}
+
+        def submit(task):
+            kind = self.executors.get(task, default_executor)
+            if kind not in pools:
+                pool_class = ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor
+                pools[kind] = pool_class(max_workers=max_workers)
+            running[pools[kind].submit(task, *self._inputs(task, completed))] = task
+
+        try:
+            for task in self.tasks.sort():
+                if waiting[task] == 0:
+                    submit(task)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    completed[task] = future.result()
+                    for pointed in graph[task]:
+                        waiting[pointed] -= 1
+                        if waiting[pointed] == 0:
+                            submit(pointed)
+        finally:
+            for pool in pools.values():
+                pool.shutdown(cancel_futures=True)
+        return completed
+    '''
+    An asyncio runner for I/O-bound pipelines. While one task waits on a file or a service, the event loop
+    runs the others. It schedules ready tasks the same way as run_parallel():
+        Coroutine functions (async def) are awaited directly on the event loop.
+        Plain functions run in the loop's default thread pool executor, so they do not block the loop.
+        A task with a limit name waits for a slot of the asyncio.Semaphore of that name, sized by limits,
+        so for example at most 4 tasks hitting the same service run at once.
+        max_concurrency caps the number of tasks running at the same time overall.
+        A task with a timeout is cancelled after that many seconds and asyncio.TimeoutError is raised.
+    If a task fails, the other running tasks are cancelled and the exception is raised.
+    '''
+    async def run_async(self, max_concurrency=None, limits=None):
+        loop = asyncio.get_running_loop()
+        graph = self.tasks.graph
+        waiting = {task: len(nodes) for task, nodes in self.tasks.predecessors.items()}
+        semaphores = {name: asyncio.Semaphore(size) for name, size in (limits or {}).items()}
+        overall = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        completed = {}
+        running = {}
+
+        async def execute(task, args):
+            async with contextlib.AsyncExitStack() as stack:
+                for semaphore in (overall, semaphores.get(self.limits.get(task))):
+                    if semaphore is not None:
+                        await stack.enter_async_context(semaphore)
+                if inspect.iscoroutinefunction(task):
+                    call = task(*args)
+                else:
+                    call = loop.run_in_executor(None, functools.partial(task, *args))
+                return await asyncio.wait_for(call, self.timeouts.get(task))
+
+        def submit(task):
+            running[asyncio.ensure_future(execute(task, self._inputs(task, completed)))] = task
+
+        try:
+            for task in self.tasks.sort():
+                if waiting[task] == 0:
+                    submit(task)
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    completed[task] = future.result()
+                    for pointed in graph[task]:
+                        waiting[pointed] -= 1
+                        if waiting[pointed] == 0:
+                            submit(pointed)
+        finally:
+            for future in running:
+                future.cancel()
+        return completed
+    '''
+    run() keeps every task's whole output in memory until the next task starts.
+    run_stream() gives each edge a Channel of buffer_size items and runs every task in its own thread, so
+    the stages overlap and a producer blocks whenever its consumer falls behind:
+        A task receives its inputs as in run(), except each upstream output is an iterator over the items
+        read from the channel, so for example a generator task can do "for line in lines: yield ...".
+        If a task returns an iterator (such as a generator), each item it yields is put on every outgoing
+        channel; any other return value is sent as one item. Batches (e.g. from parse_log_batches) are items too.
+    Memory then depends on buffer_size rather than on the size of the input.
+    A task that reads several upstream iterators should read them in step (e.g. with zip), because a full
+    channel it is not reading blocks the shared producer.
+    Returns a dictionary of the outputs of the tasks that nothing depends on, with iterators collected into lists.
+    If a task fails, the others stop producing and the first exception is raised.
+    '''
+    def run_stream(self, buffer_size=64):
+        graph = self.tasks.graph
+        channels = {(task, pointed): Channel(buffer_size) for task in graph for pointed in graph[task]}
+        completed = {}
+        errors = []
+
+        def execute(task):
+            upstream = self.tasks.predecessors[task]
+            inputs = [channels[node, task] for node in upstream]
+            outputs = [channels[task, pointed] for pointed in graph[task]]
+            try:
+                if len(upstream) > 1:
+                    result = task({node: iter(channel) for node, channel in zip(upstream, inputs)})
+                else:
+                    result = task(*(iter(channel) for channel in inputs))
+                if not outputs:
+                    completed[task] = list(result) if isinstance(result, Iterator) else result
+                    return
+                for item in (result if isinstance(result, Iterator) else (result,)):
+                    if errors or all(channel.abandoned for channel in outputs):
+                        break
+                    for channel in outputs:
+                        if not channel.abandoned:
+                            channel.put(item)
+            except BaseException as error:
+                errors.append(error)
+            finally:
+                for channel in outputs:
+                    channel.close()
+                for channel in inputs:
+                    channel.drain()
+
+        threads = [threading.Thread(target=execute, args=(task,), name=getattr(task, '__name__', None), daemon=True)
+                   for task in self.tasks.sort()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
         return completed
 
 pipeline = Pipeline()
 
+# The raw CSV is an optional side output: count_unique writes the parsed lines to it as they stream past
+# and nothing reads it back. Set it to None to skip it.
+raw_csv_file = io.StringIO()
+
 # Wrapping functions with pipeline task method to assign run dependencies
 @pipeline.task()
-def parse_logs(logs):
-    return parse_logs(logs)
+def parse_logs():
+    return parse_log(open('example_log.txt'))
 
+# Counts straight from the parsed lines, without the CSV round-trip through count_unique_request
 @pipeline.task(depends_on=parse_logs)
-def build_raw_csv(lines):
-    return build_csv(lines, header=[
-        'ip', 'time_local', 'request_type',
-        'request_path', 'status', 'bytes_sent',
-        'http_referrer', 'http_user_agent'
-    ],
-    # The StringIO object mimicks a file-like object that, instead of writing out to disk, 
-    # keeps a file-like object in memory.
-    file=io.StringIO())
-
-@pipeline.task(depends_on=build_raw_csv)
-def count_uniques(csv_file):
-    return count_unique_request(csv_file)
+def count_uniques(lines):
+    return count_unique(lines, csv_file=raw_csv_file)
 
 @pipeline.task(depends_on=count_uniques)
 def summarize_csv(lines):